@@ -1,8 +1,13 @@
 import pandas as pd
 import datetime as datetime
 import numpy as np
-import matplotlib.pyplot as plt
-from statsmodels.nonparametric.smoothers_lowess import lowess
+
+from .series import CGMSeries
+from .io import importdexcom, importdexcomfast, IMPORTER_VERSION
+from .metrics import (interdaycv, interdaysd, intradaycv, intradaysd, TIR, TOR, POR, PIR, MGE, MGN, MAGE,
+                      mage_glucose, J_index, LBGI_HBGI, LBGI, HBGI, ADRR, uniquevalfilter, minfrommid, MODD_n,
+                      modd_n_minutes, MODD_CONGA24, MODD, CONGA24, GMI, eA1c, summary, compute_all, riskkernel,
+                      METRICS_VERSION)
 
 """
     cgmquantify package
@@ -10,7 +15,14 @@ from statsmodels.nonparametric.smoothers_lowess import lowess
     The cgmquantify package is a comprehensive library for computing metrics from continuous glucose monitors.
 
     Requirements:
-    pandas, datetime, numpy, matplotlib, statsmodels
+    pandas, datetime, numpy, matplotlib (plotting only)
+
+    Metrics live in cgmquantify.metrics, Dexcom import in cgmquantify.io and plots in cgmquantify.plotting; all are
+    available from the package itself. The plot functions are loaded on first use, so importing the package for
+    metrics does not import matplotlib.
+
+    All metric and plotting functions accept either a dataframe from importdexcom() or a CGMSeries, a compact
+    array-backed container for one trace (CGMSeries.from_dataframe(importdexcom(filename))).
 
     Functions:
     importdexcom(): Imports data from Dexcom continuous glucose monitor devices
@@ -34,567 +46,68 @@ from statsmodels.nonparametric.smoothers_lowess import lowess
     GMI(): Computes and returns the glucose management index
     eA1c(): Computes and returns the American Diabetes Association estimated HbA1c
     summary(): Computes and returns glucose summary metrics, including interday mean glucose, interday median glucose, interday minimum glucose, interday maximum glucose, interday first quartile glucose, and interday third quartile glucose
+    rangemetrics(): Computes time and percent time in fixed glucose bands (default: consensus <54, 54-69, 70-180, 181-250, >250) and GRI, in one pass, overall, per day or per patient
+    GRI(): Computes and returns the Glycemia Risk Index
+    agp(): Computes the Ambulatory Glucose Profile, glucose percentiles (default: 5, 25, 50, 75, 95) per time-of-day bin, for one patient, a pooled cohort or every patient
+    compute_all(): Computes and returns many metrics at once, sharing intermediate results between them
+    importcgm(): Imports CGM exports from Dexcom, FreeStyle Libre, Medtronic or Eversense, detecting the format from the file header
+    readdataset(): Reads glucose for selected patients and a time range from a partitioned Parquet dataset (requires pyarrow)
+    writedataset(): Imports Dexcom files and appends them to a partitioned Parquet dataset (requires pyarrow)
+    findgaps(): Finds sensor gaps (warm-up, dropouts) longer than a given length
+    resample(): Resamples glucose onto a regular grid aligned to midnight, interpolating across short gaps only
+    smoothglucose(): Returns LOWESS-smoothed glucose (fast windowed fit, cached so plots and metrics share one computation)
+    rollingmetrics(): Computes metrics over a trailing time window ending at each day, for every day in one pass
+    groupmetrics(): Computes metrics for every patient of a long multi-patient dataframe, one row per patient
+    bootstrapmetrics(): Computes metrics with day-block bootstrap standard errors and confidence intervals (seeded, batched)
+    bootstrapsamples(): Computes metrics on every day-block bootstrap replicate, one row per replicate
+    chunkedmetrics(): Computes metrics for a Dexcom file too large to import at once, reading it in day-aligned chunks
+    IncrementalCGM: Keeps running metrics for live CGM feeds, updated one reading or batch at a time
+    batchmetrics(): Computes metrics for many CGM files in parallel and returns one row per file (import cgmquantify.batch)
+    Profiler: Opt-in timing, row and peak-allocation records for every public function and metric, with a summary report
+    compute_metrics_async(): Computes metrics for an export path or uploaded bytes on a bounded process pool, for asyncio servers (import cgmquantify.service; python -m cgmquantify.service runs an HTTP server)
+    CGMCache: On-disk cache of imported files and metric results keyed by file content (import cgmquantify.cache)
     plotglucosesd(): Plots glucose with specified standard deviation lines
     plotglucosebounds(): Plots glucose with user-defined boundaries
     plotglucosesmooth(): Plots smoothed glucose plot (with LOWESS smoothing)
+    plotagp(): Plots the Ambulatory Glucose Profile (median, 25-75th and 5-95th percentile bands by time of day)
             
 """
 
-def importdexcom(filename):
-    """
-        Imports data from Dexcom continuous glucose monitor devices
-        Args:
-            filename (String): path to file
-        Returns:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-    """
-    data = pd.read_csv(filename) 
-    df = pd.DataFrame()
-    df['Time'] = data['Timestamp (YYYY-MM-DDThh:mm:ss)']
-    df['Glucose'] = pd.to_numeric(data['Glucose Value (mg/dL)'])
-    df.drop(df.index[:12], inplace=True)
-    df['Time'] =  pd.to_datetime(df['Time'], format='%Y-%m-%dT%H:%M:%S')
-    df['Day'] = df['Time'].dt.date
-    df = df.reset_index()
-    return df
-
-
-def interdaycv(df):
-    """
-        Computes and returns the interday coefficient of variation of glucose
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-        Returns:
-            cvx (float): interday coefficient of variation averaged over all days
-            
-    """
-    cvx = (np.std(df['Glucose']) / (np.mean(df['Glucose'])))*100
-    return cvx
-
-def interdaysd(df):
-    """
-        Computes and returns the interday standard deviation of glucose
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-        Returns:
-            interdaysd (float): interday standard deviation averaged over all days
-            
-    """
-    interdaysd = np.std(df['Glucose'])
-    return interdaysd
-
-def intradaycv(df):
-    """
-        Computes and returns the intraday coefficient of variation of glucose 
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-        Returns:
-            intradaycv_mean (float): intraday coefficient of variation averaged over all days
-            intradaycv_medan (float): intraday coefficient of variation median over all days
-            intradaycv_sd (float): intraday coefficient of variation standard deviation over all days
-            
-    """
-    intradaycv = []
-    for i in pd.unique(df['Day']):
-        intradaycv.append(interdaycv(df[df['Day']==i]))
-    
-    intradaycv_mean = np.mean(intradaycv)
-    intradaycv_median = np.median(intradaycv)
-    intradaycv_sd = np.std(intradaycv)
-    
-    return intradaycv_mean, intradaycv_median, intradaycv_sd
-
-
-def intradaysd(df):
-    """
-        Computes and returns the intraday standard deviation of glucose 
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-        Returns:
-            intradaysd_mean (float): intraday standard deviation averaged over all days
-            intradaysd_medan (float): intraday standard deviation median over all days
-            intradaysd_sd (float): intraday standard deviation standard deviation over all days
-            
-    """
-    intradaysd =[]
-
-    for i in pd.unique(df['Day']):
-        intradaysd.append(np.std(df[df['Day']==i]))
-    
-    intradaysd_mean = np.mean(intradaysd)
-    intradaysd_median = np.median(intradaysd)
-    intradaysd_sd = np.std(intradaysd)
-    return intradaysd_mean, intradaysd_median, intradaysd_sd
-
-def TIR(df, sd=1, sr=5):
-    """
-        Computes and returns the time in range
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-            sd (integer): standard deviation for computing range (default=1)
-            sr (integer): sampling rate (default=5[minutes, once every 5 minutes glucose is recorded])
-        Returns:
-            TIR (float): time in range, units=minutes
-            
-    """
-    up = np.mean(df['Glucose']) + sd*np.std(df['Glucose'])
-    dw = np.mean(df['Glucose']) - sd*np.std(df['Glucose'])
-    TIR = len(df[(df['Glucose']<= up) & (df['Glucose']>= dw)])*sr 
-    return TIR
-
-def TOR(df, sd=1, sr=5):
-    """
-        Computes and returns the time outside range
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-            sd (integer): standard deviation for computing  range (default=1)
-            sr (integer): sampling rate (default=5[minutes, once every 5 minutes glucose is recorded])
-        Returns:
-            TOR (float): time outside range, units=minutes
-            
-    """
-    up = np.mean(df['Glucose']) + sd*np.std(df['Glucose'])
-    dw = np.mean(df['Glucose']) - sd*np.std(df['Glucose'])
-    TOR = len(df[(df['Glucose']>= up) | (df['Glucose']<= dw)])*sr
-    return TOR
-
-def POR(df, sd=1, sr=5):
-    """
-        Computes and returns the percent time outside range
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-            sd (integer): standard deviation for computing range (default=1)
-            sr (integer): sampling rate (default=5[minutes, once every 5 minutes glucose is recorded])
-        Returns:
-            POR (float): percent time outside range, units=%
-            
-    """
-    up = np.mean(df['Glucose']) + sd*np.std(df['Glucose'])
-    dw = np.mean(df['Glucose']) - sd*np.std(df['Glucose'])
-    TOR = len(df[(df['Glucose']>= up) | (df['Glucose']<= dw)])*sr
-    POR = (TOR/(len(df)*sr))*100
-    return POR
-
-def PIR(df, sd=1, sr=5):
-    """
-        Computes and returns the percent time inside range
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-            sd (integer): standard deviation for computing range (default=1)
-            sr (integer): sampling rate (default=5[minutes, once every 5 minutes glucose is recorded])
-        Returns:
-            PIR (float): percent time inside range, units=%
-            
-    """
-    up = np.mean(df['Glucose']) + sd*np.std(df['Glucose'])
-    dw = np.mean(df['Glucose']) - sd*np.std(df['Glucose'])
-    TIR = len(df[(df['Glucose']<= up) | (df['Glucose']>= dw)])*sr
-    PIR = (TIR/(len(df)*sr))*100
-    return PIR
-
-def MGE(df, sd=1):
-    """
-        Computes and returns the mean of glucose outside specified range
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-            sd (integer): standard deviation for computing range (default=1)
-        Returns:
-            MGE (float): the mean of glucose excursions (outside specified range)
-            
-    """
-    up = np.mean(df['Glucose']) + sd*np.std(df['Glucose'])
-    dw = np.mean(df['Glucose']) - sd*np.std(df['Glucose'])
-    MGE = np.mean(df[(df['Glucose']>= up) | (df['Glucose']<= dw)])
-    return MGE
-
-def MGN(df, sd=1):
-    """
-        Computes and returns the mean of glucose inside specified range
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-            sd (integer): standard deviation for computing range (default=1)
-        Returns:
-            MGN (float): the mean of glucose excursions (inside specified range)
-            
-    """
-    up = np.mean(df['Glucose']) + sd*np.std(df['Glucose'])
-    dw = np.mean(df['Glucose']) - sd*np.std(df['Glucose'])
-    MGN = np.mean(df[(df['Glucose']<= up) & (df['Glucose']>= dw)])
-    return MGN
-
-def MAGE(df, std=1):
-    """
-        Computes and returns the mean amplitude of glucose excursions
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-            sd (integer): standard deviation for computing range (default=1)
-        Returns:
-            MAGE (float): the mean amplitude of glucose excursions 
-        Refs:
-            Sneh Gajiwala: https://github.com/snehG0205/NCSA_genomics/tree/2bfbb87c9c872b1458ef3597d9fb2e56ac13ad64
-            
-    """
-        
-    #extracting glucose values and incdices
-    glucose = df['Glucose'].tolist()
-    ix = [1*i for i in range(len(glucose))]
-    stdev = std
-    
-    # local minima & maxima
-    a = np.diff(np.sign(np.diff(glucose))).nonzero()[0] + 1      
-    # local min
-    valleys = (np.diff(np.sign(np.diff(glucose))) > 0).nonzero()[0] + 1 
-    # local max
-    peaks = (np.diff(np.sign(np.diff(glucose))) < 0).nonzero()[0] + 1         
-    # +1 -- diff reduces original index number
-
-    #store local minima and maxima -> identify + remove turning points
-    excursion_points = pd.DataFrame(columns=['Index', 'Time', 'Glucose', 'Type'])
-    k=0
-    for i in range(len(peaks)):
-        excursion_points.loc[k] = [peaks[i]] + [df['Time'][k]] + [df['Glucose'][k]] + ["P"]
-        k+=1
-
-    for i in range(len(valleys)):
-        excursion_points.loc[k] = [valleys[i]] + [df['Time'][k]] + [df['Glucose'][k]] + ["V"]
-        k+=1
-
-    excursion_points = excursion_points.sort_values(by=['Index'])
-    excursion_points = excursion_points.reset_index(drop=True)
-
-
-    # selecting turning points
-    turning_points = pd.DataFrame(columns=['Index', 'Time', 'Glucose', 'Type'])
-    k=0
-    for i in range(stdev,len(excursion_points.Index)-stdev):
-        positions = [i-stdev,i,i+stdev]
-        for j in range(0,len(positions)-1):
-            if(excursion_points.Type[positions[j]] == excursion_points.Type[positions[j+1]]):
-                if(excursion_points.Type[positions[j]]=='P'):
-                    if excursion_points.Glucose[positions[j]]>=excursion_points.Glucose[positions[j+1]]:
-                        turning_points.loc[k] = excursion_points.loc[positions[j+1]]
-                        k+=1
-                    else:
-                        turning_points.loc[k] = excursion_points.loc[positions[j+1]]
-                        k+=1
-                else:
-                    if excursion_points.Glucose[positions[j]]<=excursion_points.Glucose[positions[j+1]]:
-                        turning_points.loc[k] = excursion_points.loc[positions[j]]
-                        k+=1
-                    else:
-                        turning_points.loc[k] = excursion_points.loc[positions[j+1]]
-                        k+=1
-
-    if len(turning_points.index)<10:
-        turning_points = excursion_points.copy()
-        excursion_count = len(excursion_points.index)
-    else:
-        excursion_count = len(excursion_points.index)/2
-
-
-    turning_points = turning_points.drop_duplicates(subset= "Index", keep= "first")
-    turning_points=turning_points.reset_index(drop=True)
-    excursion_points = excursion_points[excursion_points.Index.isin(turning_points.Index) == False]
-    excursion_points = excursion_points.reset_index(drop=True)
-
-    # calculating MAGE
-    mage = turning_points.Glucose.sum()/excursion_count
-    
-    return round(mage,3)
-
-
-
-def J_index(df):
-    """
-        Computes and returns the J-index
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-        Returns:
-            J (float): J-index of glucose
-            
-    """
-    J = 0.001*((np.mean(df['Glucose'])+np.std(df['Glucose']))**2)
-    return J
-
-def LBGI_HBGI(df):
-    """
-        Connecter function to calculate rh and rl, used for ADRR function
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-        Returns:
-            LBGI (float): Low blood glucose index
-            HBGI (float): High blood glucose index
-            rl (float): See calculation of LBGI
-            rh (float): See calculation of HBGI
-            
-    """
-    f = ((np.log(df['Glucose'])**1.084) - 5.381)
-    rl = []
-    for i in f: 
-        if (i <= 0):
-            rl.append(22.77*(i**2))
-        else:
-            rl.append(0)
-
-    LBGI = np.mean(rl)
-
-    rh = []
-    for i in f: 
-        if (i > 0):
-            rh.append(22.77*(i**2))
-        else:
-            rh.append(0)
-
-    HBGI = np.mean(rh)
-    
-    return LBGI, HBGI, rh, rl
-
-
-
-def LBGI(df):
-    """
-        Computes and returns the low blood glucose index
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-        Returns:
-            LBGI (float): Low blood glucose index
-            
-    """
-    f = ((np.log(df['Glucose'])**1.084) - 5.381)
-    rl = []
-    for i in f: 
-        if (i <= 0):
-            rl.append(22.77*(i**2))
-        else:
-            rl.append(0)
-
-    LBGI = np.mean(rl)
-    return LBGI
-
-def HBGI(df):
-    """
-        Computes and returns the high blood glucose index
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-        Returns:
-            HBGI (float): High blood glucose index
-            
-    """
-    f = ((np.log(df['Glucose'])**1.084) - 5.381)
-    rh = []
-    for i in f: 
-        if (i > 0):
-            rh.append(22.77*(i**2))
-        else:
-            rh.append(0)
-
-    HBGI = np.mean(rh)
-    return HBGI
-
-def ADRR(df):
-    """
-        Computes and returns the average daily risk range, an assessment of total daily glucose variations within risk space
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-        Returns:
-            ADRRx (float): average daily risk range
-            
-    """
-    ADRRl = []
-    for i in pd.unique(df['Day']):
-        LBGI, HBGI, rh, rl = LBGI_HBGI(df[df['Day']==i])
-        LR = np.max(rl)
-        HR = np.max(rh)
-        ADRRl.append(LR+HR)
-
-    ADRRx = np.mean(ADRRl)
-    return ADRRx
-
-def uniquevalfilter(df, value):
-    """
-        Supporting function for MODD and CONGA24 functions
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-            value (datetime): time to match up with previous 24 hours
-        Returns:
-            MODD_n (float): Best matched with unique value, value
-            
-    """
-    xdf = df[df['Minfrommid'] == value]
-    n = len(xdf)
-    diff = abs(xdf['Glucose'].diff())
-    MODD_n = np.nanmean(diff)
-    return MODD_n
-
-def MODD(df):
-    """
-        Computes and returns the mean of daily differences. Examines mean of value + value 24 hours before
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-        Requires:
-            uniquevalfilter (function)
-        Returns:
-            MODD (float): Mean of daily differences
-            
-    """
-    df['Timefrommidnight'] =  df['Time'].dt.time
-    lists=[]
-    for i in range(0, len(df['Timefrommidnight'])):
-        lists.append(int(df['Timefrommidnight'][i].strftime('%H:%M:%S')[0:2])*60 + int(df['Timefrommidnight'][i].strftime('%H:%M:%S')[3:5]) + round(int(df['Timefrommidnight'][i].strftime('%H:%M:%S')[6:9])/60))
-    df['Minfrommid'] = lists
-    df = df.drop(columns=['Timefrommidnight'])
-    
-    #Calculation of MODD and CONGA:
-    MODD_n = []
-    uniquetimes = df['Minfrommid'].unique()
-
-    for i in uniquetimes:
-        MODD_n.append(uniquevalfilter(df, i))
-    
-    #Remove zeros from dataframe for calculation (in case there are random unique values that result in a mean of 0)
-    MODD_n[MODD_n == 0] = np.nan
-    
-    MODD = np.nanmean(MODD_n)
-    return MODD
-
-def CONGA24(df):
-    """
-        Computes and returns the continuous overall net glycemic action over 24 hours
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-        Requires:
-            uniquevalfilter (function)
-        Returns:
-            CONGA24 (float): continuous overall net glycemic action over 24 hours
-            
-    """
-    df['Timefrommidnight'] =  df['Time'].dt.time
-    lists=[]
-    for i in range(0, len(df['Timefrommidnight'])):
-        lists.append(int(df['Timefrommidnight'][i].strftime('%H:%M:%S')[0:2])*60 + int(df['Timefrommidnight'][i].strftime('%H:%M:%S')[3:5]) + round(int(df['Timefrommidnight'][i].strftime('%H:%M:%S')[6:9])/60))
-    df['Minfrommid'] = lists
-    df = df.drop(columns=['Timefrommidnight'])
-    
-    #Calculation of MODD and CONGA:
-    MODD_n = []
-    uniquetimes = df['Minfrommid'].unique()
-
-    for i in uniquetimes:
-        MODD_n.append(uniquevalfilter(df, i))
-    
-    #Remove zeros from dataframe for calculation (in case there are random unique values that result in a mean of 0)
-    MODD_n[MODD_n == 0] = np.nan
-    
-    CONGA24 = np.nanstd(MODD_n)
-    return CONGA24
-
-def GMI(df):
-    """
-        Computes and returns the glucose management index
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-        Returns:
-            GMI (float): glucose management index (an estimate of HbA1c)
-            
-    """
-    GMI = 3.31 + (0.02392*np.mean(df['Glucose']))
-    return GMI
-
-def eA1c(df):
-    """
-        Computes and returns the American Diabetes Association estimated HbA1c
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-        Returns:
-            eA1c (float): an estimate of HbA1c from the American Diabetes Association
-            
-    """
-    eA1c = (46.7 + np.mean(df['Glucose']))/ 28.7 
-    return eA1c
-
-def summary(df): 
-    """
-        Computes and returns glucose summary metrics
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-        Returns:
-            meanG (float): interday mean of glucose
-            medianG (float): interday median of glucose
-            minG (float): interday minimum of glucose
-            maxG (float): interday maximum of glucose
-            Q1G (float): interday first quartile of glucose
-            Q3G (float): interday third quartile of glucose
-            
-    """
-    meanG = np.nanmean(df['Glucose'])
-    medianG = np.nanmedian(df['Glucose'])
-    minG = np.nanmin(df['Glucose'])
-    maxG = np.nanmax(df['Glucose'])
-    Q1G = np.nanpercentile(df['Glucose'], 25)
-    Q3G = np.nanpercentile(df['Glucose'], 75)
-    
-    return meanG, medianG, minG, maxG, Q1G, Q3G
-
-def plotglucosesd(df, sd=1, size=15):
-    """
-        Plots glucose with specified standard deviation lines
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-            sd (integer): standard deviation lines to plot (default=1)
-            size (integer): font size for plot (default=15)
-        Returns:
-            plot of glucose with standard deviation lines
-            
-    """
-    glucose_mean = np.mean(df['Glucose'])
-    up = np.mean(df['Glucose']) + sd*np.std(df['Glucose'])
-    dw = np.mean(df['Glucose']) - sd*np.std(df['Glucose'])
-
-    plt.figure(figsize=(20,5))
-    plt.rcParams.update({'font.size': size})
-    plt.plot(df['Time'], df['Glucose'], '.', color = '#1f77b4')
-    plt.axhline(y=glucose_mean, color='red', linestyle='-')
-    plt.axhline(y=up, color='pink', linestyle='-')
-    plt.axhline(y=dw, color='pink', linestyle='-')
-    plt.ylabel('Glucose')
-    plt.show()
-
-def plotglucosebounds(df, upperbound = 180, lowerbound = 70, size=15):
-    """
-        Plots glucose with user-defined boundaries
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-            upperbound (integer): user defined upper bound for glucose line to plot (default=180)
-            lowerbound (integer): user defined lower bound for glucose line to plot (default=70)
-            size (integer): font size for plot (default=15)
-        Returns:
-            plot of glucose with user defined boundary lines
-            
-    """
-    plt.figure(figsize=(20,5))
-    plt.rcParams.update({'font.size': size})
-    plt.plot(df['Time'], df['Glucose'], '.', color = '#1f77b4')
-    plt.axhline(y=upperbound, color='red', linestyle='-')
-    plt.axhline(y=lowerbound, color='orange', linestyle='-')
-    plt.ylabel('Glucose')
-    plt.show()
-
-def plotglucosesmooth(df, size=15):
-    """
-        Plots smoothed glucose plot (with LOWESS smoothing)
-        Args:
-            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
-            size (integer): font size for plot (default=15)
-        Returns:
-            LOWESS-smoothed plot of glucose
-            
-    """
-    filteres = lowess(df['Glucose'], df['Time'], is_sorted=True, frac=0.025, it=0)
-    filtered = pd.to_datetime(filteres[:,0], format='%Y-%m-%dT%H:%M:%S') 
-    
-    plt.figure(figsize=(20,5))
-    plt.rcParams.update({'font.size': size})
-    plt.plot(df['Time'], df['Glucose'], '.')
-    plt.plot(filtered, filteres[:,1], 'r')
-    plt.ylabel('Glucose')
-    plt.show()
+from .incremental import IncrementalCGM
+from .chunked import chunkedmetrics
+from .rolling import rollingmetrics
+from .preprocess import findgaps, resample, smoothglucose
+from .importers import importcgm
+from .grouped import groupmetrics
+from .ranges import rangemetrics, GRI, CONSENSUS_THRESHOLDS, CONSENSUS_UPPER_EDGES
+from .bootstrap import bootstrapmetrics, bootstrapsamples
+from .ambulatory import agp, AGP_PERCENTILES
+from .dataset import readdataset, writedataset
+from .profiling import Profiler
+
+#Plotting needs matplotlib, which takes longer to import than the rest of the package; the plot functions are
+#loaded from cgmquantify.plotting the first time one of them is used
+_LAZY = {'plotglucosesd': 'plotting', 'plotglucosebounds': 'plotting', 'plotglucosesmooth': 'plotting',
+         'plotagp': 'plotting'}
+
+#Names exported by `from cgmquantify import *`, including the lazily loaded plot functions (a star import loads
+#cgmquantify.plotting)
+__all__ = ['CGMSeries', 'importdexcom', 'importdexcomfast', 'IMPORTER_VERSION',
+           'interdaycv', 'interdaysd', 'intradaycv', 'intradaysd', 'TIR', 'TOR', 'POR', 'PIR', 'MGE', 'MGN', 'MAGE',
+           'mage_glucose', 'J_index', 'LBGI_HBGI', 'LBGI', 'HBGI', 'ADRR', 'uniquevalfilter', 'minfrommid', 'MODD_n',
+           'modd_n_minutes', 'MODD_CONGA24', 'MODD', 'CONGA24', 'GMI', 'eA1c', 'summary', 'compute_all', 'riskkernel',
+           'METRICS_VERSION', 'IncrementalCGM', 'chunkedmetrics', 'rollingmetrics', 'findgaps', 'resample',
+           'smoothglucose', 'importcgm', 'groupmetrics', 'rangemetrics', 'GRI', 'CONSENSUS_THRESHOLDS',
+           'CONSENSUS_UPPER_EDGES', 'bootstrapmetrics', 'bootstrapsamples', 'agp', 'AGP_PERCENTILES', 'readdataset',
+           'writedataset', 'Profiler'] + list(_LAZY)
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        value = getattr(importlib.import_module('.' + _LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+from .metrics import minfrommid
+from .grouped import _withids
+
+"""
+    cgmquantify.ambulatory
+    Description:
+    Ambulatory Glucose Profile (AGP): percentiles of glucose by time of day across all days of a trace. Every
+    reading is given its time-of-day bin once (from minutes from midnight, as MODD uses) and, with a patient id
+    column, its patient; one sort of all readings by (patient, bin, glucose) then lays every bin out in order, so
+    all percentiles of all bins are read off the sorted array with the same linear interpolation as np.percentile.
+
+    Functions:
+    agp(): Computes glucose percentiles per time-of-day bin, for one trace, a pooled cohort, or every patient
+
+"""
+
+#percentiles of the standard AGP report
+AGP_PERCENTILES = (5, 25, 50, 75, 95)
+
+def _binpercentiles(values, starts, percentiles):
+    """
+        Supporting function for agp, percentiles of every segment of a sorted array (np.percentile's linear method)
+        Args:
+            values (np.ndarray): values sorted within each segment
+            starts (np.ndarray): index of the first value of each segment
+            percentiles (np.ndarray): percentiles to compute, 0-100
+        Returns:
+            (np.ndarray): segments x percentiles
+    """
+    lengths = np.diff(np.append(starts, len(values)))
+    position = (lengths[:, None] - 1)*(percentiles[None, :]/100)
+    low = np.floor(position).astype(np.int64)
+    high = np.minimum(low + 1, lengths[:, None] - 1)
+    fraction = position - low
+    low, high = values[starts[:, None] + low], values[starts[:, None] + high]
+    return low + (high - low)*fraction
+
+def _smoothbins(table, window):
+    #centred moving average over `window` bins (an even width is rounded up to the next odd one), wrapping around
+    #midnight; empty bins are skipped
+    values = np.asarray(table, dtype=float)
+    valid = ~np.isnan(values)
+    half = window//2
+    padded = np.concatenate([values[-half:], values, values[:half]]) if half else values
+    counts = np.concatenate([valid[-half:], valid, valid[:half]]) if half else valid
+    kernel = np.ones(2*half + 1)
+    smoothed = np.empty_like(values)
+    for j in range(values.shape[1]):
+        sums = np.convolve(np.where(counts[:, j], padded[:, j], 0.0), kernel, mode='valid')
+        n = np.convolve(counts[:, j].astype(float), kernel, mode='valid')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            smoothed[:, j] = sums/n
+    smoothed[~valid] = np.nan
+    return smoothed
+
+def agp(df, percentiles=AGP_PERCENTILES, binsize=5, smooth=None, by=None):
+    """
+        Computes glucose percentiles per time-of-day bin (the Ambulatory Glucose Profile)
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns; for a cohort, the readings
+                of all patients in one long dataframe
+            percentiles (list): percentiles to compute, 0-100 (default=AGP_PERCENTILES, 5, 25, 50, 75 and 95)
+            binsize (integer): width of the time-of-day bins in minutes, a divisor of 1440 (default=5)
+            smooth (integer): width in bins of a centred moving average applied to each percentile curve, wrapping
+                around midnight; an even width is rounded up to the next odd one, which must not exceed the bins of
+                a day (default=None, no smoothing)
+            by (String): name of a patient id column for one profile per patient, leaving out readings with a
+                missing id; None pools all readings, e.g. a cohort profile (default=None)
+        Returns:
+            (pd.DataFrame): one row per bin (and patient), indexed by the bin's start in minutes from midnight,
+                with a column p<percentile> per percentile and n, the number of readings in the bin; bins without
+                readings have NaN percentiles
+
+    """
+    if 1440 % binsize:
+        raise ValueError('binsize must divide the 1440 minutes of a day')
+    if by is not None:
+        df = _withids(df, by)
+    percentiles = np.asarray(percentiles, dtype=float)
+    nbins = 1440//binsize
+    if smooth is not None and 2*(int(smooth)//2) + 1 > nbins:
+        raise ValueError('smooth, rounded up to an odd width, must be at most the %d bins of a day' % nbins)
+    glucose = np.asarray(df['Glucose'], dtype=float)
+    #time-of-day bin of every reading, computed once for all percentiles
+    bins = (minfrommid(df['Time']) % 1440)//binsize
+    if by is None:
+        groups, patients = np.zeros(len(glucose), dtype=np.int64), None
+        ngroups = 1
+    else:
+        groups, patients = pd.factorize(df[by], sort=True)
+        ngroups = len(patients)
+
+    valid = ~np.isnan(glucose)
+    key = groups[valid]*nbins + bins[valid]
+    order = np.lexsort((glucose[valid], key))
+    values, key = glucose[valid][order], key[order]
+    starts = np.flatnonzero(np.diff(key, prepend=-1))
+
+    table = np.full((ngroups*nbins, len(percentiles)), np.nan)
+    if len(values):
+        table[key[starts]] = _binpercentiles(values, starts, percentiles)
+    if smooth is not None and smooth > 1:
+        table = np.concatenate([_smoothbins(part, int(smooth)) for part in np.split(table, ngroups)])
+
+    columns = ['p%g' % p for p in percentiles]
+    result = pd.DataFrame(table, columns=columns)
+    result['n'] = np.bincount(key, minlength=ngroups*nbins)
+    minute = np.arange(nbins)*binsize
+    if by is None:
+        result.index = pd.Index(minute, name='minute')
+    else:
+        result.index = pd.MultiIndex.from_product([patients, minute], names=[by, 'minute'])
+    return result
@@ -0,0 +1,187 @@
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .io import importdexcom
+from .metrics import compute_all, _metricoutputs
+
+"""
+    cgmquantify.batch
+    Description:
+    Computes metrics for many CGM exports at once, spreading files over a pool of worker processes.
+
+    Functions:
+    findfiles(): Expands directories and glob patterns into a sorted list of files
+    batchmetrics(): Computes metrics for every file and returns one row per file
+
+    Command line:
+    python -m cgmquantify.batch exports/ -o metrics.csv --processes 8
+
+"""
+
+def findfiles(inputs, pattern='*.csv'):
+    """
+        Expands directories and glob patterns into a sorted list of files
+        Args:
+            inputs (String or list): files, directories or glob patterns
+            pattern (String): pattern used to list files inside directories (default='*.csv')
+        Returns:
+            files (list): sorted list of file paths, without duplicates
+
+    """
+    if isinstance(inputs, (str, os.PathLike)):
+        inputs = [inputs]
+    files = set()
+    for i in inputs:
+        i = os.fspath(i)
+        if os.path.isdir(i):
+            files.update(glob.glob(os.path.join(i, pattern)))
+        elif glob.has_magic(i):
+            files.update(glob.glob(i))
+        else:
+            files.add(i)
+    return sorted(files)
+
+#one CGMCache per worker process and cache directory
+_caches = {}
+
+def _filemetrics(task):
+    """
+        Worker function for batchmetrics: imports one file and computes its metrics, recording any error
+    """
+    filename, metrics, params, cache, memory = task
+    profiler = None
+    if memory is not None:
+        from .profiling import Profiler
+        profiler = Profiler(memory=memory).start()
+    try:
+        if cache is None:
+            results = compute_all(importdexcom(filename), metrics, **params)
+        else:
+            from .cache import CGMCache
+            if cache not in _caches:
+                _caches[cache] = CGMCache(*cache)
+            results = _caches[cache].compute_all(filename, metrics, **params)
+        error = ''
+    except Exception as e:
+        results, error = None, '%s: %s' % (type(e).__name__, e)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+    return filename, results, error, profiler.records if profiler is not None else []
+
+def batchmetrics(inputs, metrics=None, output=None, processes=None, progress=True, sd=1, sr=5, std=1,
+                 cache=None, cache_bytes=10**9, profiler=None):
+    """
+        Computes metrics for every file and returns one row per file
+        Args:
+            inputs (String or list): files, directories or glob patterns of Dexcom exports
+            metrics (list): names of metric functions to compute (default=None, all metrics, see compute_all)
+            output (String): path of a .csv or .parquet file to write the table to (default=None, not written)
+            processes (integer): number of worker processes (default=None, one per CPU; 1 runs in the current process)
+            progress (bool): print progress to stderr (default=True)
+            sd (integer): standard deviation for computing range, used by TIR, TOR, POR, PIR, MGE, MGN (default=1)
+            sr (integer): sampling rate, used by TIR, TOR, POR, PIR (default=5)
+            std (integer): standard deviation for computing range, used by MAGE (default=1)
+            cache (String): directory of a CGMCache, so unchanged files are not parsed or computed again (default=None, no cache)
+            cache_bytes (integer): size limit of the cache (default=1GB)
+            profiler (Profiler): collects timing records from every worker, see cgmquantify.profiling (default=None)
+        Returns:
+            (pd.DataFrame): one row per file, in sorted file order, with a file column, one column per metric and an error column (empty when the file succeeded)
+
+    """
+    files = findfiles(inputs)
+    if output is not None:
+        files = [f for f in files if os.path.abspath(f) != os.path.abspath(output)]
+    params = {'sd': sd, 'sr': sr, 'std': std}
+    if cache is not None:
+        cache = (os.path.abspath(os.path.expanduser(cache)), cache_bytes)
+    #workers profile themselves and send their records back; in-process runs are recorded by the profiler directly
+    memory = profiler.memory if profiler is not None else None
+    tasks = [(f, metrics, params, cache, memory if processes != 1 else None) for f in files]
+    if profiler is not None and processes == 1:
+        profiler.start()
+    columns = _metricoutputs(metrics)
+
+    csv = None
+    if output is not None and not output.endswith('.parquet'):
+        csv = open(output, 'w', newline='')
+
+    rows = []
+    if processes == 1:
+        results = map(_filemetrics, tasks)
+    else:
+        pool = ProcessPoolExecutor(max_workers=processes)
+        workers = processes or os.cpu_count() or 1
+        #map returns results in submission order, so the table order does not depend on scheduling
+        results = pool.map(_filemetrics, tasks, chunksize=max(1, min(16, len(tasks)//(4*workers))))
+
+    try:
+        for n, (filename, values, error, records) in enumerate(results):
+            for record in records:
+                profiler.add(record)
+            if values is None:
+                values = pd.Series(np.nan, index=columns)
+            row = pd.DataFrame([values.to_numpy()], columns=columns)
+            row.insert(0, 'file', filename)
+            row['error'] = error
+            rows.append(row)
+            if csv is not None:
+                row.to_csv(csv, header=(n == 0), index=False)
+                csv.flush()
+            if progress:
+                sys.stderr.write('\r[%d/%d] %s' % (n+1, len(tasks), os.path.basename(filename)))
+                sys.stderr.flush()
+    finally:
+        if processes != 1:
+            pool.shutdown()
+        elif profiler is not None:
+            profiler.stop()
+        if csv is not None:
+            csv.close()
+    if progress and tasks:
+        sys.stderr.write('\n')
+
+    if rows:
+        table = pd.concat(rows, ignore_index=True)
+    else:
+        table = pd.DataFrame(columns=['file'] + list(columns) + ['error'])
+    if output is not None and csv is None:
+        table.to_parquet(output, index=False)
+    return table
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m cgmquantify.batch',
+                                     description='Compute cgmquantify metrics for many Dexcom exports.')
+    parser.add_argument('inputs', nargs='+', help='files, directories or glob patterns of Dexcom exports')
+    parser.add_argument('-o', '--output', required=True, help='output table (.csv or .parquet)')
+    parser.add_argument('-m', '--metrics', nargs='+', default=None, help='metrics to compute (default: all)')
+    parser.add_argument('-p', '--processes', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='do not print progress')
+    parser.add_argument('--sd', type=float, default=1, help='standard deviation for range metrics (default: 1)')
+    parser.add_argument('--sr', type=float, default=5, help='sampling rate in minutes (default: 5)')
+    parser.add_argument('--std', type=int, default=1, help='standard deviation for MAGE (default: 1)')
+    parser.add_argument('--cache', default=None, help='cache directory for parsed files and metric results')
+    parser.add_argument('--profile', action='store_true', help='print time spent per function and metric to stderr')
+    args = parser.parse_args(argv)
+
+    profiler = None
+    if args.profile:
+        from .profiling import Profiler
+        profiler = Profiler()
+    table = batchmetrics(args.inputs, args.metrics, args.output, args.processes, not args.quiet,
+                         sd=args.sd, sr=args.sr, std=args.std, cache=args.cache, profiler=profiler)
+    if profiler is not None:
+        sys.stderr.write(profiler.summary().to_string() + '\n')
+    failed = (table['error'] != '').sum()
+    if failed:
+        sys.stderr.write('%d of %d files failed\n' % (failed, len(table)))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
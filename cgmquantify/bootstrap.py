@@ -0,0 +1,197 @@
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .metrics import compute_all, riskkernel, _metriclist, _metricoutputs
+
+"""
+    cgmquantify.bootstrap
+    Description:
+    Confidence intervals for the metrics by day-block bootstrap: each replicate draws the days of the trace (or
+    blocks of consecutive days) with replacement and lays them end to end as a new trace of the same number of
+    days. All replicates are drawn up front as one index matrix (replicates x days) from a seeded generator, so
+    the results depend only on the seed, not on the number of processes.
+
+    Metrics that follow from per-day sums (moments, risk values, daily standard deviations and risk maxima) are
+    evaluated for all replicates at once by gathering the per-day sums with the index matrix and reducing along
+    the days axis. The other metrics (TIR and the range metrics, MAGE, MODD, CONGA24, summary) need the readings
+    of each replicate; the replicates are built from the index matrix and computed with compute_all() on a
+    process pool.
+
+    Functions:
+    bootstrapsamples(): Computes the metrics on every day-block bootstrap replicate
+    bootstrapmetrics(): Computes the metrics with bootstrap standard errors and percentile confidence intervals
+
+"""
+
+#replicates computed by one worker task (large enough to amortize sending the trace to the worker)
+REPLICATES_PER_TASK = 50
+
+def _daysums(df):
+    """
+        Supporting function for bootstrapsamples, splits the trace into days and computes the per-day sums that
+        the batched metrics are reduced from
+    """
+    time = np.asarray(df['Time'], dtype='datetime64[s]').astype(np.int64)
+    glucose = np.asarray(df['Glucose'], dtype=float)
+    dates, codes = np.unique(time//86400, return_inverse=True)
+    codes = codes.ravel()
+    order = np.argsort(codes, kind='stable')
+    starts = np.flatnonzero(np.diff(codes[order], prepend=-1))
+    ndays = len(dates)
+
+    valid = ~np.isnan(glucose)
+    #centred on the overall mean, so the variance from pooled sums does not lose precision
+    center = np.nanmean(glucose) if valid.any() else 0.0
+    deviation = np.where(valid, glucose - center, 0.0)
+    rl, rh = riskkernel(glucose)
+    n = np.bincount(codes[valid], minlength=ndays).astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(codes[valid], weights=glucose[valid], minlength=ndays)/n
+        sd = np.sqrt(np.bincount(codes[valid], weights=(glucose[valid]-mean[codes[valid]])**2, minlength=ndays)/n)
+    return {
+        'time': time[order], 'glucose': glucose[order], 'dates': dates, 'starts': starts,
+        'lengths': np.diff(np.append(starts, len(time))), 'center': center,
+        'n': n, 'sum': np.bincount(codes, weights=deviation, minlength=ndays),
+        'sumsq': np.bincount(codes, weights=deviation**2, minlength=ndays),
+        'rows': np.bincount(codes, minlength=ndays).astype(float),
+        'rl': np.bincount(codes, weights=rl, minlength=ndays), 'rh': np.bincount(codes, weights=rh, minlength=ndays),
+        'daily_risk': np.maximum.reduceat(rl[order], starts) + np.maximum.reduceat(rh[order], starts),
+        'daily_sd': sd, 'daily_cv': (sd/mean)*100,
+    }
+
+def _moments(days, index):
+    n = days['n'][index].sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shift = days['sum'][index].sum(axis=1)/n
+        sd = np.sqrt(np.maximum(days['sumsq'][index].sum(axis=1)/n - shift**2, 0))
+    return days['center'] + shift, sd
+
+def _rowstats(values):
+    return np.mean(values, axis=1), np.median(values, axis=1), np.std(values, axis=1)
+
+#Metrics evaluated for every replicate at once from the per-day sums gathered with the index matrix:
+#name -> function of (per-day sums, index matrix) returning one value per replicate, or a tuple of such arrays
+#for the metrics compute_all() expands into several outputs. The others are computed replicate by replicate
+_BATCHED = {
+    'interdaysd': lambda d, i: _moments(d, i)[1],
+    'interdaycv': lambda d, i: (_moments(d, i)[1]/_moments(d, i)[0])*100,
+    'intradaysd': lambda d, i: _rowstats(d['daily_sd'][i]),
+    'intradaycv': lambda d, i: _rowstats(d['daily_cv'][i]),
+    'J_index': lambda d, i: 0.001*((_moments(d, i)[0] + _moments(d, i)[1])**2),
+    'LBGI': lambda d, i: d['rl'][i].sum(axis=1)/d['rows'][i].sum(axis=1),
+    'HBGI': lambda d, i: d['rh'][i].sum(axis=1)/d['rows'][i].sum(axis=1),
+    'ADRR': lambda d, i: np.mean(d['daily_risk'][i], axis=1),
+    'GMI': lambda d, i: 3.31 + (0.02392*_moments(d, i)[0]),
+    'eA1c': lambda d, i: (46.7 + _moments(d, i)[0])/28.7,
+}
+
+def _replicate(days, index):
+    """
+        Supporting function for bootstrapsamples, builds the trace of one replicate: the readings of the drawn
+        days in draw order, each day moved to the date of its position so that the replicate has consecutive days
+        Args:
+            days (dict): per-day data from _daysums
+            index (np.ndarray): drawn day numbers of the replicate
+        Returns:
+            (dict): Time (datetime64[s]) and Glucose arrays, accepted by compute_all() in place of a dataframe
+    """
+    lengths = days['lengths'][index]
+    ends = np.cumsum(lengths)
+    rows = np.arange(ends[-1]) + np.repeat(days['starts'][index] - (ends - lengths), lengths)
+    shift = np.repeat((days['dates'][0] + np.arange(len(index)) - days['dates'][index])*86400, lengths)
+    return {'Time': (days['time'][rows] + shift).astype('datetime64[s]'), 'Glucose': days['glucose'][rows]}
+
+def _replicatemetrics(task):
+    """
+        Worker function for bootstrapsamples: computes the metrics of a block of replicates
+    """
+    days, index, metrics, params = task
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.array([compute_all(_replicate(days, row), metrics, **params).to_numpy() for row in index])
+
+def _drawindex(ndays, n, block, seed):
+    #n replicates of ndays day numbers: runs of `block` consecutive days starting at uniformly drawn days
+    rng = np.random.default_rng(seed)
+    block = max(1, min(int(block), ndays))
+    first = rng.integers(0, ndays - block + 1, size=(n, -(-ndays//block)))
+    return (first[:, :, None] + np.arange(block)).reshape(n, -1)[:, :ndays]
+
+def bootstrapsamples(df, metrics=None, n=1000, seed=None, block=1, processes=None, sd=1, sr=5, std=1):
+    """
+        Computes the metrics on every day-block bootstrap replicate
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            metrics (list): names of metric functions to compute (default=None, all metrics, see compute_all)
+            n (integer): number of replicates (default=1000)
+            seed (integer): seed of the random generator, for reproducible replicates (default=None, not reproducible)
+            block (integer): consecutive days drawn together, to keep day-to-day dependence for MODD and CONGA24 (default=1)
+            processes (integer): worker processes for the metrics that are not batched (default=None, one per CPU; 1 runs in the current process)
+            sd (integer): standard deviation for computing range, used by TIR, TOR, POR, PIR, MGE, MGN (default=1)
+            sr (integer): sampling rate, used by TIR, TOR, POR, PIR (default=5)
+            std (integer): standard deviation for computing range, used by MAGE (default=1)
+        Returns:
+            (pd.DataFrame): one row per replicate, one column per metric output (as named by compute_all)
+
+    """
+    metrics = _metriclist(metrics)
+    days = _daysums(df)
+    if len(days['dates']) == 0:
+        raise ValueError('Cannot bootstrap an empty trace')
+    index = _drawindex(len(days['dates']), n, block, seed)
+
+    results = {}
+    batched = [m for m in metrics if m in _BATCHED]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for name in batched:
+            value = _BATCHED[name](days, index)
+            if isinstance(value, tuple):
+                results.update(zip(_metricoutputs([name]), value))
+            else:
+                results[name] = value
+
+    others = [m for m in metrics if m not in _BATCHED]
+    if others:
+        params = {'sd': sd, 'sr': sr, 'std': std}
+        tasks = [(days, index[i:i + REPLICATES_PER_TASK], others, params) for i in range(0, n, REPLICATES_PER_TASK)]
+        if processes == 1 or len(tasks) == 1:
+            values = list(map(_replicatemetrics, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=min(processes or os.cpu_count() or 1, len(tasks))) as pool:
+                values = list(pool.map(_replicatemetrics, tasks))
+        values = np.concatenate(values) if values else np.empty((0, len(_metricoutputs(others))))
+        results.update(zip(_metricoutputs(others), values.T))
+
+    columns = _metricoutputs(metrics)
+    return pd.DataFrame({name: results[name] for name in columns}, index=pd.RangeIndex(n, name='replicate'))
+
+def bootstrapmetrics(df, metrics=None, n=1000, ci=95, seed=None, block=1, processes=None, sd=1, sr=5, std=1):
+    """
+        Computes the metrics with day-block bootstrap standard errors and percentile confidence intervals
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            metrics (list): names of metric functions to compute (default=None, all metrics, see compute_all)
+            n (integer): number of replicates (default=1000)
+            ci (float): confidence level in percent (default=95)
+            seed (integer): seed of the random generator, for reproducible intervals (default=None, not reproducible)
+            block (integer): consecutive days drawn together, to keep day-to-day dependence for MODD and CONGA24 (default=1)
+            processes (integer): worker processes for the metrics that are not batched (default=None, one per CPU; 1 runs in the current process)
+            sd, sr, std: as in compute_all()
+        Returns:
+            (pd.DataFrame): one row per metric output, with the estimate on the whole trace, the mean and standard
+                error of the replicates, and the lower and upper bounds of the percentile interval
+
+    """
+    metrics = _metriclist(metrics)
+    samples = bootstrapsamples(df, metrics, n, seed, block, processes, sd=sd, sr=sr, std=std)
+    alpha = (100 - ci)/2
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        lower, upper = np.nanpercentile(samples.to_numpy(), [alpha, 100 - alpha], axis=0)
+    return pd.DataFrame({'estimate': compute_all(df, metrics, sd=sd, sr=sr, std=std),
+                         'mean': samples.mean(), 'se': samples.std(), 'lower': lower, 'upper': upper})
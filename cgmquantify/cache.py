@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .io import importdexcom, IMPORTER_VERSION
+from .metrics import compute_all, METRICS_VERSION
+
+"""
+    cgmquantify.cache
+    Description:
+    Opt-in on-disk cache for imported CGM files and computed metric sets, so unchanged exports are not parsed or
+    computed again. Entries are keyed by the SHA-256 of the file content, the importer and metric versions and the
+    metric parameters. Imported series are stored as .npz column arrays and metric results as small JSON records;
+    the least recently used entries are evicted once the cache grows past max_bytes.
+
+    Classes:
+    CGMCache: Cached importdexcom() and compute_all() for files
+
+"""
+
+def filehash(filename, blocksize=1 << 20):
+    """
+        Computes the SHA-256 hex digest of a file's content
+        Args:
+            filename (String): path to file
+            blocksize (integer): bytes read at a time (default=1MiB)
+        Returns:
+            (String): hex digest
+    """
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class CGMCache:
+    """
+        On-disk cache of imported CGM files and metric results, keyed by file content
+        Args:
+            directory (String): cache directory, created if missing
+            max_bytes (integer): size above which least recently used entries are evicted (default=1GB)
+
+        Example:
+            cache = CGMCache('~/.cache/cgmquantify')
+            df = cache.importdexcom('patient.csv')
+            metrics = cache.compute_all('patient.csv', ['GMI', 'TIR'], sd=1, sr=5)
+    """
+
+    def __init__(self, directory, max_bytes=10**9):
+        self.directory = os.path.expanduser(os.fspath(directory))
+        self.max_bytes = max_bytes
+        self._size = None
+        for sub in ('parsed', 'metrics'):
+            os.makedirs(os.path.join(self.directory, sub), exist_ok=True)
+
+    def _path(self, kind, key, extension):
+        return os.path.join(self.directory, kind, key + extension)
+
+    def _hit(self, path):
+        if not os.path.exists(path):
+            return False
+        #the modification time records the last use, for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            return False
+        return True
+
+    def _write(self, path, save):
+        #write to a temporary file and rename, so concurrent workers never read a partial entry
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                save(f)
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += os.path.getsize(path)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        for sub in ('parsed', 'metrics'):
+            with os.scandir(os.path.join(self.directory, sub)) as it:
+                for entry in it:
+                    if entry.is_file() and not entry.name.endswith('.tmp'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        """
+            Returns the total size of the cache entries in bytes
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, max_bytes=None):
+        """
+            Removes least recently used entries until the cache is at most max_bytes (default=self.max_bytes)
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        entries = sorted(self._entries())
+        size = sum(size for _, size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                size -= entry_size
+            except OSError:
+                pass
+        self._size = size
+
+    def clear(self):
+        """
+            Removes every entry from the cache
+        """
+        self.evict(0)
+
+    def importdexcom(self, filename, fast=False, digest=None):
+        """
+            Cached importdexcom(): returns the imported dataframe, parsing the file only when its content is not cached
+            Args:
+                filename (String): path to file
+                fast (bool): see importdexcom (default=False)
+                digest (String): content hash of the file, if already computed (default=None)
+            Returns:
+                (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        """
+        if digest is None:
+            digest = filehash(filename)
+        path = self._path('parsed', '%s-i%d-%s' % (digest, IMPORTER_VERSION, 'fast' if fast else 'full'), '.npz')
+        if self._hit(path):
+            with np.load(path, allow_pickle=False) as data:
+                df = pd.DataFrame({column: data[column] for column in data.files})
+            df['Day'] = df['Time'].dt.date
+            return df
+
+        df = importdexcom(filename, fast=fast)
+        columns = {column: df[column].to_numpy() for column in df.columns if column != 'Day'}
+        self._write(path, lambda f: np.savez(f, **columns))
+        return df
+
+    def compute_all(self, filename, metrics=None, sd=1, sr=5, std=1, fast=False):
+        """
+            Cached compute_all() for a file: returns the metrics, importing and computing only on a cache miss
+            Args:
+                filename (String): path to file
+                metrics (list): names of metric functions to compute (default=None, all metrics)
+                sd, sr, std: see compute_all
+                fast (bool): see importdexcom (default=False)
+            Returns:
+                results (pd.Series): metric values indexed by name
+        """
+        digest = filehash(filename)
+        params = json.dumps({'metrics': metrics, 'sd': sd, 'sr': sr, 'std': std, 'fast': fast,
+                             'importer': IMPORTER_VERSION, 'version': METRICS_VERSION}, sort_keys=True)
+        key = digest + '-' + hashlib.sha256(params.encode()).hexdigest()[:16]
+        path = self._path('metrics', key, '.json')
+        if self._hit(path):
+            with open(path) as f:
+                return pd.Series(json.load(f), dtype=float)
+
+        results = compute_all(self.importdexcom(filename, fast=fast, digest=digest), metrics, sd=sd, sr=sr, std=std)
+        record = json.dumps({name: float(value) for name, value in results.items()})
+        self._write(path, lambda f: f.write(record.encode()))
+        return results
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from .metrics import mage_glucose, _metriclist, _metricoutputs
+from .incremental import IncrementalCGM
+
+"""
+    cgmquantify.chunked
+    Description:
+    Out-of-core metrics for Dexcom exports too large to import at once. The file is read in chunks of rows, cut
+    at day boundaries, and each day-aligned chunk is folded into the mergeable partial aggregates of an
+    IncrementalCGM (moments, glucose value counts, risk sums, per-day moments and risk maxima, minute-of-day
+    buckets), so peak memory is one chunk plus the aggregates however long the trace is.
+
+    Functions:
+    chunkedmetrics(): Computes metrics for a Dexcom file read in day-aligned chunks
+
+"""
+
+def _chunks(filename, chunksize):
+    """
+        Supporting function for chunkedmetrics, yields (time, glucose) arrays of whole days, in file order
+    """
+    #the same rows importdexcom() keeps: the header is read, the 12 rows after it are dropped
+    reader = pd.read_csv(filename, usecols=['Timestamp (YYYY-MM-DDThh:mm:ss)', 'Glucose Value (mg/dL)'],
+                         skiprows=range(1, 13), chunksize=chunksize, encoding='utf-8-sig')
+    carry_time = np.array([], dtype='datetime64[s]')
+    carry_glucose = np.array([], dtype=float)
+    for data in reader:
+        time = pd.to_datetime(data['Timestamp (YYYY-MM-DDThh:mm:ss)'], format='%Y-%m-%dT%H:%M:%S')
+        time = np.concatenate([carry_time, np.asarray(time, dtype='datetime64[s]')])
+        glucose = np.concatenate([carry_glucose, pd.to_numeric(data['Glucose Value (mg/dL)']).to_numpy(dtype=float)])
+        #hold back the last (possibly incomplete) day for the next chunk
+        days = time.astype('datetime64[D]')
+        cut = np.searchsorted(days, days[-1], side='left') if len(days) else 0
+        if cut == 0:
+            carry_time, carry_glucose = time, glucose
+            continue
+        carry_time, carry_glucose = time[cut:], glucose[cut:]
+        yield time[:cut], glucose[:cut]
+    if len(carry_time):
+        yield carry_time, carry_glucose
+
+def chunkedmetrics(filename, metrics=None, chunksize=100000, sd=1, sr=5, std=1):
+    """
+        Computes metrics for a Dexcom file read in day-aligned chunks
+        Args:
+            filename (String): path to a Dexcom Clarity export, in time order
+            metrics (list): names of metric functions to compute (default=None, all metrics, see compute_all)
+            chunksize (integer): rows read from the file at a time (default=100000)
+            sd (integer): standard deviation for computing range, used by TIR, TOR, POR, PIR, MGE, MGN (default=1)
+            sr (integer): sampling rate, used by TIR, TOR (default=5[minutes, once every 5 minutes glucose is recorded])
+            std (integer): standard deviation for computing range, used by MAGE (default=1)
+        Returns:
+            results (pd.Series): the values compute_all(importdexcom(filename)) returns, up to floating-point rounding.
+                MAGE follows the whole sequence of turning points, so when it is requested the glucose column
+                (8 bytes per reading) is kept until the end
+
+    """
+    metrics = _metriclist(metrics)
+    if sr is None:
+        raise ValueError('chunkedmetrics needs a fixed sampling rate (sr)')
+    live = IncrementalCGM()
+    glucose_all = [] if 'MAGE' in metrics else None
+    for time, glucose in _chunks(filename, chunksize):
+        live.update(time, glucose)
+        if glucose_all is not None:
+            glucose_all.append(glucose)
+
+    results = live.metrics([m for m in metrics if m != 'MAGE'], sd=sd, sr=sr)
+    if glucose_all is not None:
+        results['MAGE'] = round(mage_glucose(np.concatenate(glucose_all) if glucose_all else np.array([]), std), 3)
+    return results.reindex(_metricoutputs(metrics))
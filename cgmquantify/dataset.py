@@ -0,0 +1,117 @@
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from .io import importdexcom
+
+"""
+    cgmquantify.dataset
+    Description:
+    Reads and writes CGM archives stored as a partitioned Parquet dataset (requires pyarrow). The layout is
+    hive-partitioned by patient and month (root/patient_id=<id>/month=<YYYY-MM>/<part>.parquet), and each file
+    holds Time and Glucose sorted by time in row groups, so a query for one patient and date range opens only the
+    matching directories and reads only the row groups whose Time statistics overlap the range.
+
+    Functions:
+    readdataset(): Reads glucose for selected patients and a time range from a Parquet dataset
+    writedataset(): Imports Dexcom files and appends them to a Parquet dataset
+
+"""
+
+#rows per Parquet row group, the unit skipped by time-range filters (one week at 5-minute sampling)
+ROW_GROUP_SIZE = 2016
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.fs
+    except ImportError:
+        raise ImportError('Parquet datasets require pyarrow (pip install pyarrow)')
+    return pyarrow
+
+def _partitioning(pa, id_column):
+    #explicit string types, so ids like "007" are not inferred as integers
+    return pa.dataset.partitioning(pa.schema([(id_column, pa.string()), ('month', pa.string())]), flavor='hive')
+
+def _month(time):
+    return np.datetime_as_string(np.asarray(time, dtype='datetime64[M]'))
+
+def writedataset(filenames, root, patient_ids=None, id_column='patient_id', fast=False, row_group_size=ROW_GROUP_SIZE):
+    """
+        Imports Dexcom files and appends them to a Parquet dataset
+        Args:
+            filenames (String or list): path(s) to Dexcom Clarity exports
+            root (String): dataset directory, created if missing
+            patient_ids (list): patient id of each file (default=None, the file name without extension)
+            id_column (String): name of the patient partition column (default='patient_id')
+            fast (bool): import with importdexcom(fast=True) (default=False)
+            row_group_size (integer): rows per row group (default=ROW_GROUP_SIZE)
+        Returns:
+            root (String): dataset directory
+
+    """
+    pa = _pyarrow()
+    if isinstance(filenames, (str, os.PathLike)):
+        filenames = [filenames]
+    if patient_ids is None:
+        patient_ids = [os.path.splitext(os.path.basename(f))[0] for f in filenames]
+    for filename, patient in zip(filenames, patient_ids):
+        df = importdexcom(filename, fast=fast).sort_values('Time', kind='stable')
+        time = np.asarray(df['Time'], dtype='datetime64[ms]')
+        table = pa.table({'Time': pa.array(time, type=pa.timestamp('ms')),
+                          'Glucose': pa.array(np.asarray(df['Glucose'], dtype=np.float32)),
+                          id_column: pa.array(np.full(len(df), str(patient), dtype=object), type=pa.string()),
+                          'month': pa.array(_month(time), type=pa.string())})
+        #a unique file name per write, so appending new exports never overwrites earlier parts
+        pa.dataset.write_dataset(table, root, format='parquet', partitioning=_partitioning(pa, id_column),
+                                 basename_template=uuid.uuid4().hex + '-{i}.parquet',
+                                 existing_data_behavior='overwrite_or_ignore',
+                                 max_rows_per_group=row_group_size, min_rows_per_group=row_group_size)
+    return root
+
+def readdataset(root, patients=None, start=None, end=None, id_column='patient_id'):
+    """
+        Reads glucose for selected patients and a time range from a Parquet dataset
+        Args:
+            root (String): dataset directory (see writedataset)
+            patients (String or list): patient id(s) to read (default=None, all patients)
+            start (String or datetime): first time included (default=None, from the beginning)
+            end (String or datetime): first time excluded (default=None, to the end)
+            id_column (String): name of the patient partition column (default='patient_id')
+        Returns:
+            (pd.DataFrame): dataframe of data with Time, Glucose, Day and patient id columns, sorted by patient and time;
+                one patient can be passed to any metric function, many to groupmetrics()
+
+    """
+    pa = _pyarrow()
+    #memory-mapped files: pages are read from the page cache instead of being copied into read buffers
+    dataset = pa.dataset.dataset(root, format='parquet', partitioning=_partitioning(pa, id_column),
+                                 filesystem=pa.fs.LocalFileSystem(use_mmap=True))
+
+    #partition filters prune directories; the Time filter skips row groups by their statistics
+    field = pa.dataset.field
+    conditions = []
+    if patients is not None:
+        if isinstance(patients, str):
+            patients = [patients]
+        conditions.append(field(id_column).isin([str(p) for p in patients]))
+    if start is not None:
+        start = pd.Timestamp(start)
+        conditions.append(field('month') >= str(_month(start.to_datetime64())))
+        conditions.append(field('Time') >= pa.scalar(start.to_datetime64().astype('datetime64[ms]'), pa.timestamp('ms')))
+    if end is not None:
+        end = pd.Timestamp(end)
+        conditions.append(field('month') <= str(_month(end.to_datetime64())))
+        conditions.append(field('Time') < pa.scalar(end.to_datetime64().astype('datetime64[ms]'), pa.timestamp('ms')))
+    condition = None
+    for c in conditions:
+        condition = c if condition is None else condition & c
+
+    table = dataset.to_table(columns=['Time', 'Glucose', id_column], filter=condition)
+    table = table.sort_by([(id_column, 'ascending'), ('Time', 'ascending')])
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    df['Day'] = df['Time'].dt.date
+    return df[['Time', 'Glucose', 'Day', id_column]]
@@ -0,0 +1,185 @@
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from .metrics import riskkernel, minfrommid, mage_glucose, _metriclist, _metricoutputs
+
+"""
+    cgmquantify.grouped
+    Description:
+    Metrics for a long dataframe holding many patients (one row per reading and a patient id column). The frame
+    is sorted once; most metrics are segment reductions (np.*.reduceat over patient, patient-day and
+    patient-minute boundaries), and MAGE, which is sequential, runs per patient on a process pool.
+
+    Functions:
+    groupmetrics(): Computes metrics for every patient of a long dataframe and returns one row per patient
+
+"""
+
+def _withids(df, id_column):
+    #readings without a patient id belong to no patient and are left out, as pandas groupby leaves out NaN keys
+    missing = np.asarray(df[id_column].isna())
+    if missing.all():
+        raise ValueError('No readings with a patient id in column %s' % id_column)
+    return df[~missing] if missing.any() else df
+
+def _segments(keys):
+    #start of every run of equal keys in a sorted array
+    return np.flatnonzero(np.diff(keys, prepend=keys[:1] - 1)) if len(keys) else np.array([], dtype=np.int64)
+
+def _lengths(starts, n):
+    return np.diff(np.append(starts, n))
+
+def _groupdurations(time, ids, starts, valid):
+    """
+        Supporting function for groupmetrics, minutes each reading stands for (as the durations used by TIR with
+        sr=None), per patient: the time to the next reading of the same patient, or the patient's typical interval
+        for the last reading and for readings before a gap (more than twice the typical interval); 0 if missing
+        Args:
+            time (np.ndarray): epoch seconds, sorted by patient then time
+            ids (np.ndarray): patient code of each reading
+            starts (np.ndarray): index of the first reading of each patient
+            valid (np.ndarray): True where glucose is not missing
+    """
+    durations = np.append(np.diff(time)/60, 0.0)
+    durations[starts[1:] - 1] = np.nan
+    durations[-1:] = np.nan
+    typical = pd.Series(durations).groupby(ids).median().to_numpy()[ids]
+    durations = np.where(np.isnan(durations) | (durations > 2*typical), typical, durations)
+    return np.where(valid, durations, 0.0)
+
+def _segmentstats(values, starts):
+    """
+        Supporting function for groupmetrics, mean, median and standard deviation of every segment of values
+        (as np.mean, np.median and np.std, so a NaN anywhere in a segment gives NaN)
+    """
+    lengths = _lengths(starts, len(values))
+    codes = np.repeat(np.arange(len(starts)), lengths)
+    mean = np.add.reduceat(values, starts)/lengths
+    sd = np.sqrt(np.add.reduceat((values - mean[codes])**2, starts)/lengths)
+    ordered = values[np.lexsort((values, codes))]
+    median = (ordered[starts + (lengths - 1)//2] + ordered[starts + lengths//2])/2
+    median[np.isnan(mean)] = np.nan
+    return mean, median, sd
+
+def groupmetrics(df, id_column='patient_id', metrics=None, sd=1, sr=5, std=1, processes=None):
+    """
+        Computes metrics for every patient of a long dataframe and returns one row per patient
+        Args:
+            (pd.DataFrame): dataframe with Time, Glucose and patient id columns, many patients in one frame
+            id_column (String): name of the patient id column; readings with a missing id are left out
+                (default='patient_id')
+            metrics (list): names of metric functions to compute (default=None, all metrics, see compute_all)
+            sd (integer): standard deviation for computing range, used by TIR, TOR, POR, PIR, MGE, MGN (default=1)
+            sr (integer): sampling rate, used by TIR, TOR, POR, PIR (default=5; None uses the actual time between readings)
+            std (integer): standard deviation for computing range, used by MAGE (default=1)
+            processes (integer): worker processes for MAGE (default=None, one per CPU; 1 runs in the current process)
+        Returns:
+            (pd.DataFrame): one row per patient, indexed by patient id, with the same columns compute_all() returns
+
+    """
+    metrics = _metriclist(metrics)
+    df = _withids(df, id_column)
+    ids, patients = pd.factorize(df[id_column], sort=True)
+    time = np.asarray(df['Time'], dtype='datetime64[s]').astype(np.int64)
+    glucose = np.asarray(df['Glucose'], dtype=float)
+
+    #sort once by patient then time
+    order = np.lexsort((time, ids))
+    ids, time, glucose = ids[order], time[order], glucose[order]
+    n, npatients = len(glucose), len(patients)
+    starts = _segments(ids)
+    total = _lengths(starts, n)
+
+    valid = ~np.isnan(glucose)
+    count = np.add.reduceat(valid.astype(np.int64), starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.add.reduceat(np.where(valid, glucose, 0.0), starts)/count
+        deviation = np.where(valid, glucose - mean[ids], 0.0)
+        sdev = np.sqrt(np.add.reduceat(deviation**2, starts)/count)
+    dw, up = (mean - sd*sdev)[ids], (mean + sd*sdev)[ids]
+
+    results = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        results['interdaysd'] = sdev
+        results['interdaycv'] = (sdev/mean)*100
+        results['J_index'] = 0.001*((mean+sdev)**2)
+        results['GMI'] = 3.31 + (0.02392*mean)
+        results['eA1c'] = (46.7 + mean)/ 28.7
+
+        if {'TIR', 'TOR', 'POR', 'PIR', 'MGE', 'MGN'}.intersection(metrics):
+            inrange = (glucose <= up) & (glucose >= dw)
+            outrange = (glucose >= up) | (glucose <= dw)
+            if sr is None:
+                durations = _groupdurations(time, ids, starts, valid)
+                results['TIR'] = np.add.reduceat(np.where(inrange, durations, 0.0), starts)
+                results['TOR'] = np.add.reduceat(np.where(outrange, durations, 0.0), starts)
+                covered = np.add.reduceat(durations, starts)
+                results['POR'] = results['TOR']/covered*100
+                results['PIR'] = results['TIR']/covered*100
+            else:
+                results['TIR'] = np.add.reduceat(inrange.astype(np.int64), starts)*sr
+                results['TOR'] = np.add.reduceat(outrange.astype(np.int64), starts)*sr
+                results['POR'] = np.add.reduceat(outrange.astype(np.int64), starts)/total*100
+                results['PIR'] = np.add.reduceat(inrange.astype(np.int64), starts)/total*100
+            results['MGE'] = np.add.reduceat(np.where(outrange, glucose, 0.0), starts)/np.add.reduceat(outrange.astype(np.int64), starts)
+            results['MGN'] = np.add.reduceat(np.where(inrange, glucose, 0.0), starts)/np.add.reduceat(inrange.astype(np.int64), starts)
+
+        rl, rh = riskkernel(glucose)
+        results['LBGI'] = np.add.reduceat(rl, starts)/total
+        results['HBGI'] = np.add.reduceat(rh, starts)/total
+
+        if {'intradaysd', 'intradaycv', 'ADRR'}.intersection(metrics):
+            #patient-day segments: the frame is sorted by patient then time, so days are contiguous
+            day = time//86400
+            daystarts = _segments(ids*(day.max() - day.min() + 1) + (day - day.min()))
+            #days of one patient are contiguous too, so per-patient stats over days are segment reductions
+            patientdays = _segments(ids[daystarts])
+            daycodes = np.repeat(np.arange(len(daystarts)), _lengths(daystarts, n))
+            daycount = np.add.reduceat(valid.astype(np.int64), daystarts)
+            daymean = np.add.reduceat(np.where(valid, glucose, 0.0), daystarts)/daycount
+            daysd = np.sqrt(np.add.reduceat(np.where(valid, glucose - daymean[daycodes], 0.0)**2, daystarts)/daycount)
+            for name, values in (('intradaysd', daysd), ('intradaycv', (daysd/daymean)*100)):
+                stats = _segmentstats(values, patientdays)
+                results.update(zip((name + '_mean', name + '_median', name + '_sd'), stats))
+            adrr = np.maximum.reduceat(rl, daystarts) + np.maximum.reduceat(rh, daystarts)
+            results['ADRR'] = np.add.reduceat(adrr, patientdays)/_lengths(patientdays, len(adrr))
+
+        if {'MODD', 'CONGA24'}.intersection(metrics):
+            #patient-minute groups: one stable sort keeps the day order within each minute
+            minutes = minfrommid(time.astype('datetime64[s]'))
+            key = ids*1441 + minutes
+            byminute = np.argsort(key, kind='stable')
+            key_sorted = key[byminute]
+            diff = np.abs(np.diff(glucose[byminute]))
+            same = (key_sorted[1:] == key_sorted[:-1]) & ~np.isnan(diff)
+            sums = np.bincount(key_sorted[1:][same], weights=diff[same], minlength=npatients*1441)
+            counts = np.bincount(key_sorted[1:][same], minlength=npatients*1441)
+            modd_n = (sums/counts).reshape(npatients, 1441)
+            modd_n[np.arange(npatients), minutes[starts]] = np.nan
+            modd_n[(np.bincount(key, minlength=npatients*1441) == 0).reshape(npatients, 1441)] = np.nan
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                results['MODD'] = np.nanmean(modd_n, axis=1)
+                results['CONGA24'] = np.nanstd(modd_n, axis=1)
+
+    if 'summary' in metrics:
+        grouped = pd.Series(glucose).groupby(ids)
+        results.update({'meanG': grouped.mean().to_numpy(), 'medianG': grouped.median().to_numpy(),
+                        'minG': grouped.min().to_numpy(), 'maxG': grouped.max().to_numpy(),
+                        'Q1G': grouped.quantile(0.25).to_numpy(), 'Q3G': grouped.quantile(0.75).to_numpy()})
+
+    if 'MAGE' in metrics:
+        segments = [glucose[start:start + length] for start, length in zip(starts, total)]
+        if processes == 1:
+            mage = list(map(mage_glucose, segments, repeat(std)))
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                mage = list(pool.map(mage_glucose, segments, repeat(std), chunksize=max(1, len(segments)//64)))
+        results['MAGE'] = np.round(mage, 3)
+
+    columns = _metricoutputs(metrics)
+    return pd.DataFrame({name: results[name] for name in columns}, index=pd.Index(patients, name=id_column))
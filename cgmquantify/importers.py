@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+
+"""
+    cgmquantify.importers
+    Description:
+    Registry of CGM file importers with format auto-detection. Each importer reads only the columns it needs,
+    converts mmol/L to mg/dL, maps "Low"/"High" sentinel strings to numbers and returns the same Time, Glucose
+    and Day dataframe as importdexcom().
+
+    Functions:
+    importcgm(): Imports a CGM export from any registered vendor, detecting the format from the file header
+    detectvendor(): Returns the name of the importer that recognizes a file
+    registerimporter(): Registers an importer for a new vendor format
+
+    Registered formats:
+    dexcom: Dexcom Clarity export (Timestamp (YYYY-MM-DDThh:mm:ss), Glucose Value (mg/dL or mmol/L)); unlike
+        importdexcom(), which drops the first 12 rows by position, every row with a timestamp and glucose is kept
+    libre: FreeStyle LibreView export (Device Timestamp, Historic Glucose mg/dL or mmol/L)
+    medtronic: Medtronic CareLink export (Date, Time, Sensor Glucose (mg/dL or mmol/L))
+    eversense: Eversense DMS export (Date, Time, Glucose (mg/dL or mmol/L))
+
+"""
+
+MMOL_TO_MGDL = 18.0
+
+#lines read from the top of a file to detect its format
+SNIFF_LINES = 50
+
+#timestamp formats written by LibreView and Eversense DMS in different regions, most common first
+LIBRE_TIME_FORMATS = ['%m-%d-%Y %I:%M %p', '%m-%d-%Y %H:%M', '%d-%m-%Y %H:%M', '%Y-%m-%d %H:%M',
+                      '%d.%m.%Y %H:%M', '%m/%d/%Y %I:%M %p', '%m/%d/%Y %H:%M', '%d/%m/%Y %H:%M']
+EVERSENSE_TIME_FORMATS = ['%m/%d/%Y %H:%M:%S', '%m/%d/%Y %I:%M:%S %p', '%m/%d/%Y %H:%M', '%m/%d/%Y %I:%M %p',
+                          '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M']
+
+_IMPORTERS = {}
+
+def registerimporter(name, detect):
+    """
+        Registers an importer for a new vendor format (use as a decorator on the read function)
+        Args:
+            name (String): vendor name, used by importcgm(vendor=name)
+            detect (function): takes the first lines of a file (list of String) and returns True if the format is recognized
+        Returns:
+            decorator for read(filename, lines) -> pd.DataFrame with Time and Glucose columns
+    """
+    def register(read):
+        _IMPORTERS[name] = (detect, read)
+        return read
+    return register
+
+def _sniff(filename):
+    lines = []
+    with open(filename, encoding='utf-8-sig', errors='replace') as f:
+        for line in f:
+            lines.append(line.rstrip('\r\n'))
+            if len(lines) >= SNIFF_LINES:
+                break
+    return lines
+
+def _headerline(lines, *columns):
+    #index of the first line that contains every column name
+    for i, line in enumerate(lines):
+        if all(column in line for column in columns):
+            return i
+    return None
+
+def detectvendor(filename):
+    """
+        Returns the name of the importer that recognizes a file
+        Args:
+            filename (String): path to file
+        Returns:
+            (String): vendor name
+    """
+    return _detect(filename, _sniff(filename))
+
+def _detect(filename, lines):
+    for name, (detect, read) in _IMPORTERS.items():
+        if detect(lines):
+            return name
+    raise ValueError('Unrecognized CGM file format: %s' % filename)
+
+def glucosevalues(values, unit='mg/dL', low=40, high=400):
+    """
+        Converts a column of glucose readings to float mg/dL, mapping sentinel strings in one vectorized pass
+        Args:
+            values (pd.Series): glucose readings as read from the file (numbers or strings)
+            unit (String): 'mg/dL' or 'mmol/L' (default='mg/dL')
+            low (float): value in mg/dL used for "Low"/"LO" readings (default=40)
+            high (float): value in mg/dL used for "High"/"HI" readings (default=400)
+        Returns:
+            (np.ndarray): glucose in mg/dL, NaN where the reading is missing or not a number
+    """
+    glucose = np.array(pd.to_numeric(values, errors='coerce'), dtype=float)
+    if unit == 'mmol/L':
+        glucose = glucose*MMOL_TO_MGDL
+    if values.dtype == object or pd.api.types.is_string_dtype(values):
+        text = values.astype('string').str.strip().str.lower()
+        glucose[text.isin(['low', 'lo']).to_numpy(dtype=bool, na_value=False)] = low
+        glucose[text.isin(['high', 'hi']).to_numpy(dtype=bool, na_value=False)] = high
+    return glucose
+
+def _frame(time, glucose):
+    df = pd.DataFrame({'Time': time, 'Glucose': glucose})
+    df = df[df['Time'].notna() & df['Glucose'].notna()].reset_index(drop=True)
+    df['Day'] = df['Time'].dt.date
+    return df
+
+def _parsetime(text, formats):
+    #one explicit format for the whole column: the first of formats that parses the most timestamps (so a day
+    #after the 12th settles day/month order), instead of guessing the format of every element
+    best = None
+    for fmt in formats:
+        time = pd.to_datetime(text, format=fmt, errors='coerce')
+        if best is None or time.notna().sum() > best.notna().sum():
+            best = time
+        if best.notna().sum() == text.notna().sum():
+            break
+    return best
+
+def _unit(lines, header, mgdl, mmol):
+    return 'mmol/L' if mmol in lines[header] and mgdl not in lines[header] else 'mg/dL'
+
+@registerimporter('dexcom', lambda lines: _headerline(lines, 'Timestamp (YYYY-MM-DDThh:mm:ss)', 'Glucose Value (') is not None)
+def _readdexcom(filename, lines):
+    header = _headerline(lines, 'Timestamp (YYYY-MM-DDThh:mm:ss)', 'Glucose Value (')
+    unit = _unit(lines, header, 'Glucose Value (mg/dL)', 'Glucose Value (mmol/L)')
+    glucose_column = 'Glucose Value (%s)' % unit
+    data = pd.read_csv(filename, skiprows=header, usecols=['Timestamp (YYYY-MM-DDThh:mm:ss)', glucose_column],
+                       dtype={glucose_column: str}, encoding='utf-8-sig')
+    time = pd.to_datetime(data['Timestamp (YYYY-MM-DDThh:mm:ss)'], format='%Y-%m-%dT%H:%M:%S', errors='coerce')
+    return _frame(time, glucosevalues(data[glucose_column], unit, low=40, high=400))
+
+@registerimporter('libre', lambda lines: _headerline(lines, 'Device Timestamp', 'Historic Glucose') is not None)
+def _readlibre(filename, lines):
+    header = _headerline(lines, 'Device Timestamp', 'Historic Glucose')
+    unit = _unit(lines, header, 'Historic Glucose mg/dL', 'Historic Glucose mmol/L')
+    glucose_column = 'Historic Glucose %s' % unit
+    data = pd.read_csv(filename, skiprows=header, usecols=['Device Timestamp', glucose_column],
+                       dtype={'Device Timestamp': str, glucose_column: str}, encoding='utf-8-sig')
+    time = _parsetime(data['Device Timestamp'], LIBRE_TIME_FORMATS)
+    return _frame(time, glucosevalues(data[glucose_column], unit, low=40, high=500))
+
+@registerimporter('medtronic', lambda lines: _headerline(lines, 'Date', 'Time', 'Sensor Glucose (') is not None)
+def _readmedtronic(filename, lines):
+    header = _headerline(lines, 'Date', 'Time', 'Sensor Glucose (')
+    unit = _unit(lines, header, 'Sensor Glucose (mg/dL)', 'Sensor Glucose (mmol/L)')
+    glucose_column = 'Sensor Glucose (%s)' % unit
+    data = pd.read_csv(filename, skiprows=header, usecols=['Date', 'Time', glucose_column],
+                       dtype=str, encoding='utf-8-sig')
+    #CareLink repeats the header line between device sections; those rows fail to parse and are dropped
+    time = pd.to_datetime(data['Date'] + ' ' + data['Time'], format='%Y/%m/%d %H:%M:%S', errors='coerce')
+    return _frame(time, glucosevalues(data[glucose_column], unit, low=40, high=400))
+
+def _iseversense(lines):
+    header = _headerline(lines, 'Date', 'Time', 'Glucose (')
+    return header is not None and 'Sensor Glucose' not in lines[header]
+
+@registerimporter('eversense', _iseversense)
+def _readeversense(filename, lines):
+    header = _headerline(lines, 'Date', 'Time', 'Glucose (')
+    unit = _unit(lines, header, 'Glucose (mg/dL)', 'Glucose (mmol/L)')
+    glucose_column = 'Glucose (%s)' % unit
+    data = pd.read_csv(filename, skiprows=header, usecols=['Date', 'Time', glucose_column],
+                       dtype=str, encoding='utf-8-sig')
+    time = _parsetime(data['Date'] + ' ' + data['Time'], EVERSENSE_TIME_FORMATS)
+    return _frame(time, glucosevalues(data[glucose_column], unit, low=40, high=400))
+
+def importcgm(filename, vendor=None):
+    """
+        Imports a CGM export from any registered vendor, detecting the format from the file header
+        Args:
+            filename (String): path to file
+            vendor (String): name of a registered importer, to skip detection (default=None, detect)
+        Returns:
+            (pd.DataFrame): dataframe of data with Time, Glucose (mg/dL) and Day columns, one row per glucose reading
+        Raises:
+            ValueError: the format is not recognized, or no reading has both a timestamp and a glucose value
+    """
+    lines = _sniff(filename)
+    if vendor is None:
+        vendor = _detect(filename, lines)
+    if vendor not in _IMPORTERS:
+        raise ValueError('Unknown vendor: %s (registered: %s)' % (vendor, ', '.join(_IMPORTERS)))
+    df = _IMPORTERS[vendor][1](filename, lines)
+    if len(df) == 0:
+        raise ValueError('No glucose readings with a recognized timestamp in %s (%s format)' % (filename, vendor))
+    return df
@@ -0,0 +1,226 @@
+import numpy as np
+import pandas as pd
+
+from .metrics import riskkernel, minfrommid, _stats, _bounds
+
+"""
+    cgmquantify.incremental
+    Description:
+    Keeps running state for live CGM feeds so that metrics can be read at any time without rescanning history.
+
+    Classes:
+    IncrementalCGM: Accepts readings one at a time or in batches and returns current metric values
+
+"""
+
+def _merge(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    """
+        Supporting function for IncrementalCGM, merges two sets of (count, mean, sum of squared deviations) (Chan et al.)
+    """
+    n = n_a + n_b
+    if n == 0:
+        return 0, 0.0, 0.0
+    delta = mean_b - mean_a
+    mean = mean_a + delta*n_b/n
+    m2 = m2_a + m2_b + delta**2*n_a*n_b/n
+    return n, mean, m2
+
+def _countpercentile(values, counts, q):
+    """
+        Supporting function for IncrementalCGM, q-th percentile of the readings described by distinct sorted values
+        and their counts, interpolated linearly like np.percentile
+    """
+    position = q/100*(counts.sum() - 1)
+    cumulative = np.cumsum(counts)
+    lo = values[np.searchsorted(cumulative, np.floor(position), side='right')]
+    hi = values[np.searchsorted(cumulative, np.ceil(position), side='right')]
+    return lo + (hi - lo)*(position - np.floor(position))
+
+class IncrementalCGM:
+    """
+        Running metrics for a live CGM feed. Every update costs time proportional to the size of the batch,
+        not to the history; metrics() reads the current values from the running state.
+
+        State kept:
+            count, mean and sum of squared deviations (Welford/Chan) for interdaysd, interdaycv, J_index, GMI, eA1c
+            counts of each distinct glucose value for TIR, TOR, PIR, POR, MGE, MGN (bounds move with the mean, so
+            ranges are counted from the value counts when metrics are read) and for the summary quantiles
+            running sums of the low and high risk values for LBGI and HBGI
+            per-day count, mean, sum of squared deviations and risk maxima for intradaysd, intradaycv and ADRR
+            per-minute-of-day last value and sum of absolute differences for MODD and CONGA24
+
+        MAGE needs the whole sequence of turning points and is not available incrementally.
+
+        Example:
+            live = IncrementalCGM()
+            live.update(time, glucose)
+            live.metrics(['GMI', 'TIR'])
+    """
+
+    METRICS = ['interdaysd', 'interdaycv', 'intradaysd', 'intradaycv', 'TIR', 'TOR', 'POR', 'PIR', 'MGE', 'MGN',
+               'J_index', 'LBGI', 'HBGI', 'ADRR', 'MODD', 'CONGA24', 'GMI', 'eA1c', 'summary']
+
+    def __init__(self):
+        self.total = 0
+        self.n, self.mean, self.m2 = 0, 0.0, 0.0
+        self.values = {}
+        self.rl_sum, self.rh_sum = 0.0, 0.0
+        #day (datetime64[D]) -> [count, mean, sum of squared deviations, max low risk, max high risk]
+        self.days = {}
+        self.first_minute = None
+        self.minute_last = np.full(1441, np.nan)
+        self.minute_seen = np.zeros(1441, dtype=bool)
+        self.minute_sum = np.zeros(1441)
+        self.minute_count = np.zeros(1441, dtype=np.int64)
+
+    def update(self, time, glucose):
+        """
+            Adds one reading or a batch of readings, in time order
+            Args:
+                time (datetime or array-like): timestamp(s) of the reading(s)
+                glucose (float or array-like): glucose value(s)
+            Returns:
+                self (IncrementalCGM)
+
+        """
+        time = np.atleast_1d(np.asarray(time, dtype='datetime64[s]'))
+        glucose = np.atleast_1d(np.asarray(glucose, dtype=float))
+        if len(glucose) == 0:
+            return self
+        valid = ~np.isnan(glucose)
+        g = glucose[valid]
+
+        #moments
+        self.total += len(glucose)
+        if len(g):
+            self.n, self.mean, self.m2 = _merge(self.n, self.mean, self.m2,
+                                                len(g), np.mean(g), np.sum((g - np.mean(g))**2))
+
+        #value counts for the range metrics
+        for value, count in zip(*np.unique(g, return_counts=True)):
+            self.values[value] = self.values.get(value, 0) + count
+
+        #risk sums and per-day buckets
+        rl, rh = riskkernel(glucose)
+        self.rl_sum += rl.sum()
+        self.rh_sum += rh.sum()
+        days, codes = np.unique(time.astype('datetime64[D]'), return_inverse=True)
+        codes = codes.ravel()
+        n = np.bincount(codes[valid], minlength=len(days))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            day_mean = np.where(n > 0, np.bincount(codes[valid], weights=g, minlength=len(days))/n, 0.0)
+        day_m2 = np.bincount(codes[valid], weights=(g - day_mean[codes[valid]])**2, minlength=len(days))
+        order = np.argsort(codes, kind='stable')
+        starts = np.flatnonzero(np.diff(codes[order], prepend=-1))
+        day_rl = np.maximum.reduceat(rl[order], starts)
+        day_rh = np.maximum.reduceat(rh[order], starts)
+        for i, day in enumerate(days):
+            bucket = self.days.get(day, [0, 0.0, 0.0, 0.0, 0.0])
+            bucket[:3] = _merge(bucket[0], bucket[1], bucket[2], n[i], day_mean[i], day_m2[i])
+            bucket[3] = max(bucket[3], day_rl[i])
+            bucket[4] = max(bucket[4], day_rh[i])
+            self.days[day] = bucket
+
+        #per-minute daily differences, continuing from the last reading seen at each minute
+        minutes = minfrommid(time)
+        if self.first_minute is None:
+            self.first_minute = minutes[0]
+        order = np.argsort(minutes, kind='stable')
+        minutes_sorted = minutes[order]
+        glucose_sorted = glucose[order]
+        first = np.ones(len(minutes_sorted), dtype=bool)
+        first[1:] = minutes_sorted[1:] != minutes_sorted[:-1]
+        previous = np.empty(len(glucose_sorted))
+        previous[1:] = glucose_sorted[:-1]
+        previous[first] = self.minute_last[minutes_sorted[first]]
+        diff = np.abs(glucose_sorted - previous)
+        ok = ~np.isnan(diff)
+        self.minute_sum += np.bincount(minutes_sorted[ok], weights=diff[ok], minlength=1441)
+        self.minute_count += np.bincount(minutes_sorted[ok], minlength=1441)
+        last = np.ones(len(minutes_sorted), dtype=bool)
+        last[:-1] = first[1:]
+        self.minute_last[minutes_sorted[last]] = glucose_sorted[last]
+        self.minute_seen[minutes_sorted] = True
+        return self
+
+    def metrics(self, metrics=None, sd=1, sr=5):
+        """
+            Returns the current metric values from the running state
+            Args:
+                metrics (list): names of metrics to return (default=None, all of IncrementalCGM.METRICS)
+                sd (integer): standard deviation for computing range (default=1)
+                sr (integer): sampling rate (default=5[minutes, once every 5 minutes glucose is recorded])
+            Returns:
+                results (pd.Series): metric values indexed by name, named as in compute_all()
+
+        """
+        if metrics is None:
+            metrics = self.METRICS
+        unknown = [m for m in metrics if m not in self.METRICS]
+        if unknown:
+            raise ValueError('Metrics not available incrementally: ' + ', '.join(unknown))
+
+        mean = self.mean if self.n else np.nan
+        std = np.sqrt(self.m2/self.n) if self.n else np.nan
+        values = np.fromiter(self.values.keys(), dtype=float, count=len(self.values))
+        counts = np.fromiter(self.values.values(), dtype=float, count=len(self.values))
+        order = np.argsort(values)
+        values, counts = values[order], counts[order]
+        dw, up = _bounds((mean, std), sd)
+        inrange = (values <= up) & (values >= dw)
+        outrange = (values >= up) | (values <= dw)
+        buckets = np.array(list(self.days.values()), dtype=float).reshape(-1, 5)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            day_sd = np.sqrt(buckets[:, 2]/buckets[:, 0])
+            day_cv = (day_sd/buckets[:, 1])*100
+            modd_n = self.minute_sum/self.minute_count
+        if self.first_minute is not None:
+            modd_n[self.first_minute] = np.nan
+        modd_n = modd_n[self.minute_seen]
+
+        results = {}
+        for name in metrics:
+            if name == 'interdaysd':
+                results[name] = std
+            elif name == 'interdaycv':
+                results[name] = (std/mean)*100
+            elif name == 'intradaysd':
+                results.update(zip(('intradaysd_mean', 'intradaysd_median', 'intradaysd_sd'), _stats(day_sd)))
+            elif name == 'intradaycv':
+                results.update(zip(('intradaycv_mean', 'intradaycv_median', 'intradaycv_sd'), _stats(day_cv)))
+            elif name == 'TIR':
+                results[name] = counts[inrange].sum()*sr
+            elif name == 'TOR':
+                results[name] = counts[outrange].sum()*sr
+            elif name == 'POR':
+                results[name] = (counts[outrange].sum()/self.total)*100
+            elif name == 'PIR':
+                results[name] = (counts[inrange].sum()/self.total)*100
+            elif name == 'MGE':
+                results[name] = np.sum(values[outrange]*counts[outrange])/counts[outrange].sum()
+            elif name == 'MGN':
+                results[name] = np.sum(values[inrange]*counts[inrange])/counts[inrange].sum()
+            elif name == 'J_index':
+                results[name] = 0.001*((mean+std)**2)
+            elif name == 'LBGI':
+                results[name] = self.rl_sum/self.total
+            elif name == 'HBGI':
+                results[name] = self.rh_sum/self.total
+            elif name == 'ADRR':
+                results[name] = np.mean(buckets[:, 3] + buckets[:, 4])
+            elif name == 'MODD':
+                results[name] = np.nanmean(modd_n)
+            elif name == 'CONGA24':
+                results[name] = np.nanstd(modd_n)
+            elif name == 'GMI':
+                results[name] = 3.31 + (0.02392*mean)
+            elif name == 'eA1c':
+                results[name] = (46.7 + mean)/ 28.7
+            elif name == 'summary':
+                if len(values):
+                    quantiles = [_countpercentile(values, counts, q) for q in (50, 25, 75)]
+                    summary = (mean, quantiles[0], values[0], values[-1], quantiles[1], quantiles[2])
+                else:
+                    summary = (np.nan,)*6
+                results.update(zip(('meanG', 'medianG', 'minG', 'maxG', 'Q1G', 'Q3G'), summary))
+        return pd.Series(results, dtype=float)
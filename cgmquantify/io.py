@@ -0,0 +1,60 @@
+import pandas as pd
+
+"""
+    cgmquantify.io
+    Description:
+    Dexcom Clarity export import (importdexcom). Other vendors are read by cgmquantify.importers.
+
+    Functions:
+    importdexcom(): Imports data from Dexcom continuous glucose monitor devices
+
+"""
+
+#Bump when importdexcom() changes its output, so results cached by cgmquantify.cache are not reused
+IMPORTER_VERSION = 1
+
+def importdexcom(filename, fast=False):
+    """
+        Imports data from Dexcom continuous glucose monitor devices
+        Args:
+            filename (String): path to file
+            fast (bool): read only the timestamp and glucose columns with fixed dtypes, using the pyarrow CSV engine when installed (default=False)
+        Returns:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns (with fast=True, Glucose is float32 and there is no index column)
+    """
+    if fast:
+        return importdexcomfast(filename)
+    data = pd.read_csv(filename) 
+    df = pd.DataFrame()
+    df['Time'] = data['Timestamp (YYYY-MM-DDThh:mm:ss)']
+    df['Glucose'] = pd.to_numeric(data['Glucose Value (mg/dL)'])
+    df.drop(df.index[:12], inplace=True)
+    df['Time'] =  pd.to_datetime(df['Time'], format='%Y-%m-%dT%H:%M:%S')
+    df['Day'] = df['Time'].dt.date
+    df = df.reset_index()
+    return df
+
+def importdexcomfast(filename):
+    """
+        Supporting function for importdexcom, reads only the timestamp and glucose columns and skips the 12 header/event rows at read time
+        Args:
+            filename (String): path to file
+        Returns:
+            (pd.DataFrame): dataframe of data with Time (datetime64), Glucose (float32) and Day columns
+    """
+    header = pd.read_csv(filename, nrows=0).columns.str.lstrip('\ufeff')
+    columns = [header.get_loc('Timestamp (YYYY-MM-DDThh:mm:ss)'), header.get_loc('Glucose Value (mg/dL)')]
+    try:
+        import pyarrow
+        engine = 'pyarrow'
+    except ImportError:
+        engine = 'c'
+    names = ['Time', 'Glucose'] if columns[0] < columns[1] else ['Glucose', 'Time']
+    data = pd.read_csv(filename, engine=engine, header=None, skiprows=13, usecols=sorted(columns), names=names,
+                       dtype={'Glucose': 'float32'})
+    #the pyarrow engine already parses the ISO timestamps while reading
+    if not pd.api.types.is_datetime64_dtype(data['Time']):
+        data['Time'] = pd.to_datetime(data['Time'], format='%Y-%m-%dT%H:%M:%S')
+    df = pd.DataFrame({'Time': data['Time'], 'Glucose': data['Glucose']})
+    df['Day'] = df['Time'].dt.date
+    return df
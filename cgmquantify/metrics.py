@@ -0,0 +1,720 @@
+import threading
+
+import pandas as pd
+import numpy as np
+
+from .series import CGMSeries
+
+"""
+    cgmquantify.metrics
+    Description:
+    The glucose metrics, computed from shared intermediates (moments, per-day grouping, risk values, minutes from
+    midnight) so that compute_all() computes each intermediate only once. Needs only numpy and pandas.
+
+    Functions:
+    See the cgmquantify package docstring; every metric function is re-exported there.
+
+"""
+
+#Bump when a metric changes its output, so results cached by cgmquantify.cache are not reused
+METRICS_VERSION = 2
+
+#Shared intermediates: each node is computed once per cache, from the nodes it depends on.
+#Metric functions resolve the nodes they need; compute_all() shares one cache across many metrics
+
+def _glucose(df):
+    return np.asarray(df['Glucose'], dtype=float)
+
+def _moments(glucose):
+    return np.nanmean(glucose), np.nanstd(glucose)
+
+def _days(df):
+    #day of each reading as an integer code, plus the sort order and start of each day for np.*.reduceat
+    if isinstance(df, CGMSeries):
+        return df.daycodes(), np.arange(len(df)), df.day_starts
+    codes = np.unique(np.asarray(df['Time'], dtype='datetime64[D]'), return_inverse=True)[1].ravel()
+    order = np.argsort(codes, kind='stable')
+    starts = np.flatnonzero(np.diff(codes[order], prepend=-1))
+    return codes, order, starts
+
+def _daily_moments(glucose, days):
+    codes, order, starts = days
+    ndays = len(starts)
+    valid = ~np.isnan(glucose)
+    n = np.bincount(codes[valid], minlength=ndays)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(codes[valid], weights=glucose[valid], minlength=ndays)/n
+        sd = np.sqrt(np.bincount(codes[valid], weights=(glucose[valid]-mean[codes[valid]])**2, minlength=ndays)/n)
+    return mean, sd
+
+def riskkernel(glucose):
+    """
+        Supporting function for LBGI, HBGI and ADRR, computes the low and high risk value of every reading
+        (the Kovatchev risk transform); with USE_NUMBA set, uses a parallel Numba-compiled loop for very large arrays when Numba is installed and several threads are available
+        Args:
+            glucose (np.ndarray): glucose values (float64)
+        Returns:
+            rl (np.ndarray): low risk value of each reading (0 where glucose is in the high risk range or missing)
+            rh (np.ndarray): high risk value of each reading (0 where glucose is in the low risk range or missing)
+            
+    """
+    if USE_NUMBA and len(glucose) >= _NUMBA_MIN_SIZE and _usenumba():
+        return _numbakernel()(glucose)
+    return _riskkernel_numpy(glucose)
+
+def _riskkernel_numpy(glucose):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        f = ((np.log(glucose)**1.084) - 5.381)
+    r = 22.77*(f**2)
+    rl = np.where(f <= 0, r, 0.0)
+    rh = np.where(f > 0, r, 0.0)
+    return rl, rh
+
+#Opt-in parallel risk kernel (cgmquantify.metrics.USE_NUMBA = True). Off by default: the riskkernel benchmark
+#(test_benchmarks.py) has only shown the compiled loop about 1.6x slower than NumPy on one thread, at every size
+#from 1e3 to 1e7 readings; a win on several threads is unmeasured. The package forks process pools (batchmetrics,
+#groupmetrics, bootstrapsamples, the service): after a parallel launch Numba's TBB layer hangs the parent at exit
+#once it has forked, and GNU OpenMP kills forked workers that launch again, so callers combining the two should set
+#NUMBA_THREADING_LAYER=workqueue in the environment. The Numba config is never changed here
+USE_NUMBA = False
+#arrays large enough to amortize the 1-2 s each process pays to compile or load the cached kernel
+_NUMBA_MIN_SIZE = 1000000
+_NUMBA_KERNEL = []
+_NUMBA_THREADS = []
+_NUMBA_LOCK = threading.Lock()
+
+def _usenumba():
+    #Numba is installed and may run on more than one thread (the config is read without compiling anything)
+    if not _NUMBA_THREADS:
+        try:
+            from numba import config
+        except ImportError:
+            _NUMBA_THREADS.append(0)
+        else:
+            _NUMBA_THREADS.append(config.NUMBA_NUM_THREADS)
+    return _NUMBA_THREADS[0] > 1
+
+def _numbakernel():
+    #Numba is imported and the kernel compiled on the first large array, not when the package is imported
+    if not _NUMBA_KERNEL:
+        try:
+            import numba
+        except ImportError:
+            _NUMBA_KERNEL.append(None)
+        else:
+            #the workqueue layer (see USE_NUMBA) does not allow concurrent launches, hence the lock (the kernel
+            #already uses every thread)
+            @numba.njit(cache=True, parallel=True)
+            def _riskkernel_numba(glucose):
+                rl = np.zeros(len(glucose))
+                rh = np.zeros(len(glucose))
+                for i in numba.prange(len(glucose)):
+                    f = (np.log(glucose[i])**1.084) - 5.381
+                    if f <= 0:
+                        rl[i] = 22.77*(f**2)
+                    elif f > 0:
+                        rh[i] = 22.77*(f**2)
+                return rl, rh
+
+            def _riskkernel_locked(glucose):
+                with _NUMBA_LOCK:
+                    return _riskkernel_numba(glucose)
+            _NUMBA_KERNEL.append(_riskkernel_locked)
+    return _NUMBA_KERNEL[0]
+
+def _daily_risk(risk, days):
+    rl, rh = risk
+    codes, order, starts = days
+    LR = np.maximum.reduceat(rl[order], starts)
+    HR = np.maximum.reduceat(rh[order], starts)
+    return LR, HR
+
+def _minutes(df):
+    return minfrommid(df['Time'])
+
+def _modd_n(minutes, glucose):
+    return modd_n_minutes(minutes, glucose)
+
+def _durations(df, glucose):
+    #minutes each reading stands for: the time to the next reading, or the typical sampling interval for the
+    #last reading and for readings followed by a sensor gap (more than twice the typical interval); 0 if missing
+    seconds = np.asarray(df['Time'], dtype='datetime64[s]').astype(np.int64)
+    durations = np.diff(seconds)/60
+    typical = np.median(durations) if len(durations) else 0.0
+    durations = np.where(durations > 2*typical, typical, durations)
+    return np.where(np.isnan(glucose), 0.0, np.append(durations, typical))
+
+_INTERMEDIATES = {
+    'glucose': (_glucose, ('df',)),
+    'moments': (_moments, ('glucose',)),
+    'days': (_days, ('df',)),
+    'daily_moments': (_daily_moments, ('glucose', 'days')),
+    'risk': (riskkernel, ('glucose',)),
+    'daily_risk': (_daily_risk, ('risk', 'days')),
+    'minutes': (_minutes, ('df',)),
+    'modd_n': (_modd_n, ('minutes', 'glucose')),
+    'durations': (_durations, ('df', 'glucose')),
+}
+
+def _resolve(name, cache):
+    if name not in cache:
+        func, deps = _INTERMEDIATES[name]
+        cache[name] = func(*[_resolve(dep, cache) for dep in deps])
+    return cache[name]
+
+def _bounds(moments, sd):
+    mean, std = moments
+    return mean - sd*std, mean + sd*std
+
+def _stats(values):
+    return np.mean(values), np.median(values), np.std(values)
+
+def _inrange(glucose, moments, sd):
+    dw, up = _bounds(moments, sd)
+    return (glucose <= up) & (glucose >= dw)
+
+def _outrange(glucose, moments, sd):
+    dw, up = _bounds(moments, sd)
+    return (glucose >= up) | (glucose <= dw)
+
+def _rangetime(mask, durations, sr):
+    #minutes spent where mask is True: sr minutes per reading, or the actual durations when sr is None
+    if sr is None:
+        return durations[mask].sum()
+    return np.count_nonzero(mask)*sr
+
+def _rangepercent(mask, durations, sr):
+    if sr is None:
+        return (durations[mask].sum()/durations.sum())*100
+    return (np.count_nonzero(mask)/len(mask))*100
+
+def interdaycv(df):
+    """
+        Computes and returns the interday coefficient of variation of glucose
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        Returns:
+            cvx (float): interday coefficient of variation averaged over all days
+            
+    """
+    cvx = (np.std(df['Glucose']) / (np.mean(df['Glucose'])))*100
+    return cvx
+
+def interdaysd(df):
+    """
+        Computes and returns the interday standard deviation of glucose
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        Returns:
+            interdaysd (float): interday standard deviation averaged over all days
+            
+    """
+    interdaysd = np.std(df['Glucose'])
+    return interdaysd
+
+def intradaycv(df):
+    """
+        Computes and returns the intraday coefficient of variation of glucose 
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        Returns:
+            intradaycv_mean (float): intraday coefficient of variation averaged over all days
+            intradaycv_medan (float): intraday coefficient of variation median over all days
+            intradaycv_sd (float): intraday coefficient of variation standard deviation over all days
+            
+    """
+    mean, sd = _resolve('daily_moments', {'df': df})
+    intradaycv = (sd/mean)*100
+    
+    intradaycv_mean = np.mean(intradaycv)
+    intradaycv_median = np.median(intradaycv)
+    intradaycv_sd = np.std(intradaycv)
+    
+    return intradaycv_mean, intradaycv_median, intradaycv_sd
+
+
+def intradaysd(df):
+    """
+        Computes and returns the intraday standard deviation of glucose 
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        Returns:
+            intradaysd_mean (float): intraday standard deviation averaged over all days
+            intradaysd_medan (float): intraday standard deviation median over all days
+            intradaysd_sd (float): intraday standard deviation standard deviation over all days
+            
+    """
+    intradaysd = _resolve('daily_moments', {'df': df})[1]
+    
+    intradaysd_mean = np.mean(intradaysd)
+    intradaysd_median = np.median(intradaysd)
+    intradaysd_sd = np.std(intradaysd)
+    return intradaysd_mean, intradaysd_median, intradaysd_sd
+
+def TIR(df, sd=1, sr=5):
+    """
+        Computes and returns the time in range
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            sd (integer): standard deviation for computing range (default=1)
+            sr (integer): sampling rate (default=5[minutes, once every 5 minutes glucose is recorded]; None uses the actual time between readings)
+        Returns:
+            TIR (float): time in range, units=minutes
+            
+    """
+    cache = {'df': df}
+    glucose, moments = _resolve('glucose', cache), _resolve('moments', cache)
+    durations = _resolve('durations', cache) if sr is None else None
+    TIR = _rangetime(_inrange(glucose, moments, sd), durations, sr)
+    return TIR
+
+def TOR(df, sd=1, sr=5):
+    """
+        Computes and returns the time outside range
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            sd (integer): standard deviation for computing  range (default=1)
+            sr (integer): sampling rate (default=5[minutes, once every 5 minutes glucose is recorded]; None uses the actual time between readings)
+        Returns:
+            TOR (float): time outside range, units=minutes
+            
+    """
+    cache = {'df': df}
+    glucose, moments = _resolve('glucose', cache), _resolve('moments', cache)
+    durations = _resolve('durations', cache) if sr is None else None
+    TOR = _rangetime(_outrange(glucose, moments, sd), durations, sr)
+    return TOR
+
+def POR(df, sd=1, sr=5):
+    """
+        Computes and returns the percent time outside range
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            sd (integer): standard deviation for computing range (default=1)
+            sr (integer): sampling rate (default=5[minutes, once every 5 minutes glucose is recorded]; None uses the actual time between readings)
+        Returns:
+            POR (float): percent time outside range, units=%
+            
+    """
+    cache = {'df': df}
+    glucose, moments = _resolve('glucose', cache), _resolve('moments', cache)
+    durations = _resolve('durations', cache) if sr is None else None
+    POR = _rangepercent(_outrange(glucose, moments, sd), durations, sr)
+    return POR
+
+def PIR(df, sd=1, sr=5):
+    """
+        Computes and returns the percent time inside range
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            sd (integer): standard deviation for computing range (default=1)
+            sr (integer): sampling rate (default=5[minutes, once every 5 minutes glucose is recorded]; None uses the actual time between readings)
+        Returns:
+            PIR (float): percent time inside range, units=%
+            
+    """
+    cache = {'df': df}
+    glucose, moments = _resolve('glucose', cache), _resolve('moments', cache)
+    durations = _resolve('durations', cache) if sr is None else None
+    PIR = _rangepercent(_inrange(glucose, moments, sd), durations, sr)
+    return PIR
+
+def MGE(df, sd=1):
+    """
+        Computes and returns the mean of glucose outside specified range
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            sd (integer): standard deviation for computing range (default=1)
+        Returns:
+            MGE (float): the mean of glucose excursions (outside specified range)
+            
+    """
+    up = np.mean(df['Glucose']) + sd*np.std(df['Glucose'])
+    dw = np.mean(df['Glucose']) - sd*np.std(df['Glucose'])
+    MGE = np.mean(df['Glucose'][(df['Glucose']>= up) | (df['Glucose']<= dw)])
+    return MGE
+
+def MGN(df, sd=1):
+    """
+        Computes and returns the mean of glucose inside specified range
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            sd (integer): standard deviation for computing range (default=1)
+        Returns:
+            MGN (float): the mean of glucose excursions (inside specified range)
+            
+    """
+    up = np.mean(df['Glucose']) + sd*np.std(df['Glucose'])
+    dw = np.mean(df['Glucose']) - sd*np.std(df['Glucose'])
+    MGN = np.mean(df['Glucose'][(df['Glucose']<= up) & (df['Glucose']>= dw)])
+    return MGN
+
+def MAGE(df, std=1):
+    """
+        Computes and returns the mean amplitude of glucose excursions
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            sd (integer): standard deviation for computing range (default=1)
+        Returns:
+            MAGE (float): the mean amplitude of glucose excursions 
+        Refs:
+            Sneh Gajiwala: https://github.com/snehG0205/NCSA_genomics/tree/2bfbb87c9c872b1458ef3597d9fb2e56ac13ad64
+            
+    """
+        
+    mage = mage_glucose(np.asarray(df['Glucose'], dtype=float), std)
+    return round(mage,3)
+
+def mage_glucose(glucose, std=1):
+    """
+        Supporting function for MAGE, computes the mean amplitude of glucose excursions on a glucose array
+        Args:
+            glucose (np.ndarray): glucose values in time order
+            std (integer): standard deviation for computing range (default=1)
+        Returns:
+            mage (float): the mean amplitude of glucose excursions (unrounded)
+            
+    """
+    stdev = std
+    
+    # local min
+    valleys = (np.diff(np.sign(np.diff(glucose))) > 0).nonzero()[0] + 1 
+    # local max
+    peaks = (np.diff(np.sign(np.diff(glucose))) < 0).nonzero()[0] + 1         
+    # +1 -- diff reduces original index number
+
+    #store local minima and maxima -> identify + remove turning points
+    #excursion points are assigned the glucose values in order of insertion (peaks, then valleys), as before
+    index = np.concatenate([peaks, valleys])
+    is_peak = np.concatenate([np.ones(len(peaks), dtype=bool), np.zeros(len(valleys), dtype=bool)])
+    values = glucose[:len(index)]
+    order = np.argsort(index, kind='stable')
+    index, is_peak, values = index[order], is_peak[order], values[order]
+
+    # selecting turning points: compare each excursion point with the point stdev positions before and after it
+    i = np.arange(stdev, len(index)-stdev)
+    first = np.concatenate([i-stdev, i])
+    second = np.concatenate([i, i+stdev])
+    same_type = is_peak[first] == is_peak[second]
+    first, second = first[same_type], second[same_type]
+    turning_points = np.where(is_peak[first] | (values[first] > values[second]), second, first)
+
+    if len(turning_points)<10:
+        turning_points = np.arange(len(index))
+        excursion_count = len(index)
+    else:
+        excursion_count = len(index)/2
+
+    turning_points = np.unique(turning_points)
+
+    # calculating MAGE
+    mage = values[turning_points].sum()/excursion_count
+    
+    return mage
+
+
+
+def J_index(df):
+    """
+        Computes and returns the J-index
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        Returns:
+            J (float): J-index of glucose
+            
+    """
+    J = 0.001*((np.mean(df['Glucose'])+np.std(df['Glucose']))**2)
+    return J
+
+def LBGI_HBGI(df):
+    """
+        Connecter function to calculate rh and rl, used for ADRR function
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        Returns:
+            LBGI (float): Low blood glucose index
+            HBGI (float): High blood glucose index
+            rh (np.ndarray): high risk value of each reading, see calculation of HBGI
+            rl (np.ndarray): low risk value of each reading, see calculation of LBGI
+            
+    """
+    rl, rh = _resolve('risk', {'df': df})
+    LBGI = np.mean(rl)
+    HBGI = np.mean(rh)
+    
+    return LBGI, HBGI, rh, rl
+
+
+
+def LBGI(df):
+    """
+        Computes and returns the low blood glucose index
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        Returns:
+            LBGI (float): Low blood glucose index
+            
+    """
+    rl = _resolve('risk', {'df': df})[0]
+    LBGI = np.mean(rl)
+    return LBGI
+
+def HBGI(df):
+    """
+        Computes and returns the high blood glucose index
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        Returns:
+            HBGI (float): High blood glucose index
+            
+    """
+    rh = _resolve('risk', {'df': df})[1]
+    HBGI = np.mean(rh)
+    return HBGI
+
+def ADRR(df):
+    """
+        Computes and returns the average daily risk range, an assessment of total daily glucose variations within risk space
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        Returns:
+            ADRRx (float): average daily risk range
+            
+    """
+    LR, HR = _resolve('daily_risk', {'df': df})
+    ADRRl = LR + HR
+
+    ADRRx = np.mean(ADRRl)
+    return ADRRx
+
+def uniquevalfilter(df, value):
+    """
+        Supporting function for MODD and CONGA24 functions
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            value (datetime): time to match up with previous 24 hours
+        Returns:
+            MODD_n (float): Best matched with unique value, value
+            
+    """
+    xdf = df[df['Minfrommid'] == value]
+    n = len(xdf)
+    diff = abs(xdf['Glucose'].diff())
+    MODD_n = np.nanmean(diff)
+    return MODD_n
+
+def minfrommid(time):
+    """
+        Supporting function for MODD and CONGA24 functions, computes minutes from midnight in one vectorized step
+        Args:
+            time (pd.Series): datetime64 timestamps (the Time column)
+        Returns:
+            Minfrommid (np.ndarray): minutes from midnight, seconds rounded to the nearest minute
+            
+    """
+    seconds = np.asarray(time, dtype='datetime64[s]').astype(np.int64) % 86400
+    Minfrommid = seconds//60 + (seconds % 60 > 30)
+    return Minfrommid
+
+def MODD_n(df):
+    """
+        Supporting function for MODD and CONGA24 functions, computes the mean absolute difference
+        between readings taken at the same minute of day on successive days, for every minute of day
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        Requires:
+            minfrommid (function)
+            modd_n_minutes (function)
+        Returns:
+            MODD_n (np.ndarray): mean of daily differences for each unique minute from midnight
+            
+    """
+    return modd_n_minutes(minfrommid(df['Time']), np.asarray(df['Glucose'], dtype=float))
+
+def modd_n_minutes(minutes, glucose):
+    """
+        Supporting function for MODD_n, computes the per-minute daily differences from precomputed minutes from midnight
+        Args:
+            minutes (np.ndarray): minutes from midnight of each reading (see minfrommid)
+            glucose (np.ndarray): glucose values in time order
+        Returns:
+            MODD_n (np.ndarray): mean of daily differences for each unique minute from midnight
+            
+    """
+    #Group readings by minute from midnight with one stable sort (keeps day order within each minute)
+    order = np.argsort(minutes, kind='stable')
+    minutes_sorted = minutes[order]
+    diff = np.abs(np.diff(glucose[order]))
+    same = (minutes_sorted[1:] == minutes_sorted[:-1]) & ~np.isnan(diff)
+    
+    sums = np.bincount(minutes_sorted[1:][same], weights=diff[same], minlength=1441)
+    counts = np.bincount(minutes_sorted[1:][same], minlength=1441)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        MODD_n = sums/counts
+    
+    #The minute of the first reading is left out of the calculation, as in the original per-minute loop
+    MODD_n[minutes[0]] = np.nan
+    
+    return MODD_n[np.bincount(minutes, minlength=1441) > 0]
+
+def MODD_CONGA24(df):
+    """
+        Connecter function to calculate MODD and CONGA24 from the same per-minute differences
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        Requires:
+            MODD_n (function)
+        Returns:
+            MODD (float): Mean of daily differences
+            CONGA24 (float): continuous overall net glycemic action over 24 hours
+            
+    """
+    modd_n = MODD_n(df)
+    MODD = np.nanmean(modd_n)
+    CONGA24 = np.nanstd(modd_n)
+    return MODD, CONGA24
+
+def MODD(df):
+    """
+        Computes and returns the mean of daily differences. Examines mean of value + value 24 hours before
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        Requires:
+            MODD_n (function)
+        Returns:
+            MODD (float): Mean of daily differences
+            
+    """
+    MODD = np.nanmean(MODD_n(df))
+    return MODD
+
+def CONGA24(df):
+    """
+        Computes and returns the continuous overall net glycemic action over 24 hours
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        Requires:
+            MODD_n (function)
+        Returns:
+            CONGA24 (float): continuous overall net glycemic action over 24 hours
+            
+    """
+    CONGA24 = np.nanstd(MODD_n(df))
+    return CONGA24
+
+def GMI(df):
+    """
+        Computes and returns the glucose management index
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        Returns:
+            GMI (float): glucose management index (an estimate of HbA1c)
+            
+    """
+    GMI = 3.31 + (0.02392*np.mean(df['Glucose']))
+    return GMI
+
+def eA1c(df):
+    """
+        Computes and returns the American Diabetes Association estimated HbA1c
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        Returns:
+            eA1c (float): an estimate of HbA1c from the American Diabetes Association
+            
+    """
+    eA1c = (46.7 + np.mean(df['Glucose']))/ 28.7 
+    return eA1c
+
+def summary(df): 
+    """
+        Computes and returns glucose summary metrics
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+        Returns:
+            meanG (float): interday mean of glucose
+            medianG (float): interday median of glucose
+            minG (float): interday minimum of glucose
+            maxG (float): interday maximum of glucose
+            Q1G (float): interday first quartile of glucose
+            Q3G (float): interday third quartile of glucose
+            
+    """
+    meanG = np.nanmean(df['Glucose'])
+    medianG = np.nanmedian(df['Glucose'])
+    minG = np.nanmin(df['Glucose'])
+    maxG = np.nanmax(df['Glucose'])
+    Q1G = np.nanpercentile(df['Glucose'], 25)
+    Q3G = np.nanpercentile(df['Glucose'], 75)
+    
+    return meanG, medianG, minG, maxG, Q1G, Q3G
+
+#Metric name -> (intermediates used, function of those intermediates and the metric parameters, output names)
+_METRICS = {
+    'interdaysd': (('moments',), lambda m, **p: m[1], None),
+    'interdaycv': (('moments',), lambda m, **p: (m[1]/m[0])*100, None),
+    'intradaysd': (('daily_moments',), lambda d, **p: _stats(d[1]),
+                   ('intradaysd_mean', 'intradaysd_median', 'intradaysd_sd')),
+    'intradaycv': (('daily_moments',), lambda d, **p: _stats((d[1]/d[0])*100),
+                   ('intradaycv_mean', 'intradaycv_median', 'intradaycv_sd')),
+    'TIR': (('glucose', 'moments', 'durations'), lambda g, m, t, sd=1, sr=5, **p: _rangetime(_inrange(g, m, sd), t, sr), None),
+    'TOR': (('glucose', 'moments', 'durations'), lambda g, m, t, sd=1, sr=5, **p: _rangetime(_outrange(g, m, sd), t, sr), None),
+    'POR': (('glucose', 'moments', 'durations'), lambda g, m, t, sd=1, sr=5, **p: _rangepercent(_outrange(g, m, sd), t, sr), None),
+    'PIR': (('glucose', 'moments', 'durations'), lambda g, m, t, sd=1, sr=5, **p: _rangepercent(_inrange(g, m, sd), t, sr), None),
+    'MGE': (('glucose', 'moments'), lambda g, m, sd=1, **p: np.mean(g[_outrange(g, m, sd)]), None),
+    'MGN': (('glucose', 'moments'), lambda g, m, sd=1, **p: np.mean(g[_inrange(g, m, sd)]), None),
+    'MAGE': (('glucose',), lambda g, std=1, **p: round(mage_glucose(g, std), 3), None),
+    'J_index': (('moments',), lambda m, **p: 0.001*((m[0]+m[1])**2), None),
+    'LBGI': (('risk',), lambda r, **p: np.mean(r[0]), None),
+    'HBGI': (('risk',), lambda r, **p: np.mean(r[1]), None),
+    'ADRR': (('daily_risk',), lambda d, **p: np.mean(d[0]+d[1]), None),
+    'MODD': (('modd_n',), lambda n, **p: np.nanmean(n), None),
+    'CONGA24': (('modd_n',), lambda n, **p: np.nanstd(n), None),
+    'GMI': (('moments',), lambda m, **p: 3.31 + (0.02392*m[0]), None),
+    'eA1c': (('moments',), lambda m, **p: (46.7 + m[0])/ 28.7, None),
+    'summary': (('glucose',), lambda g, **p: (np.nanmean(g), np.nanmedian(g), np.nanmin(g), np.nanmax(g), np.nanpercentile(g, 25), np.nanpercentile(g, 75)),
+                ('meanG', 'medianG', 'minG', 'maxG', 'Q1G', 'Q3G')),
+}
+
+def _metriclist(metrics):
+    if metrics is None:
+        metrics = list(_METRICS)
+    unknown = [m for m in metrics if m not in _METRICS]
+    if unknown:
+        raise ValueError('Unknown metrics: ' + ', '.join(unknown))
+    return metrics
+
+def _metricoutputs(metrics=None):
+    #names of the entries compute_all() returns for these metrics
+    outputs = []
+    for name in _metriclist(metrics):
+        outputs.extend(_METRICS[name][2] or (name,))
+    return outputs
+
+def compute_all(df, metrics=None, sd=1, sr=5, std=1):
+    """
+        Computes and returns many metrics at once, sharing intermediate results (moments, per-day grouping,
+        risk values, minutes from midnight) so that each is computed only once
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            metrics (list): names of metric functions to compute (default=None, all metrics)
+            sd (integer): standard deviation for computing range, used by TIR, TOR, POR, PIR, MGE, MGN (default=1)
+            sr (integer): sampling rate, used by TIR, TOR, POR, PIR (default=5[minutes, once every 5 minutes glucose is recorded]; None uses the actual time between readings)
+            std (integer): standard deviation for computing range, used by MAGE (default=1)
+        Returns:
+            results (pd.Series): metric values indexed by name; metrics returning several values (intradaycv, intradaysd, summary) are expanded into one entry per value
+            
+    """
+    metrics = _metriclist(metrics)
+    cache = {'df': df}
+    results = {}
+    for name in metrics:
+        deps, func, outputs = _METRICS[name]
+        #the range metrics only use durations when sr is None (the time between readings)
+        args = [None if dep == 'durations' and sr is not None else _resolve(dep, cache) for dep in deps]
+        value = func(*args, sd=sd, sr=sr, std=std)
+        if outputs is None:
+            results[name] = value
+        else:
+            results.update(zip(outputs, value))
+    return pd.Series(results, dtype=float)
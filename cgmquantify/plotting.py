@@ -0,0 +1,193 @@
+import os
+import threading
+
+import numpy as np
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from .preprocess import smoothglucose
+from .ambulatory import agp, AGP_PERCENTILES
+
+"""
+    cgmquantify.plotting
+    Description:
+    Glucose plots. Loaded on first use of a plot function, so metric-only code never imports matplotlib; pyplot
+    is only imported to show a plot interactively.
+
+    Functions:
+    plotglucosesd(): Plots glucose with specified standard deviation lines
+    plotglucosebounds(): Plots glucose with user-defined boundaries
+    plotglucosesmooth(): Plots smoothed glucose plot (with LOWESS smoothing)
+    plotagp(): Plots the Ambulatory Glucose Profile (glucose percentiles by time of day)
+
+"""
+
+#Report rendering: plots written to a file are drawn on one reusable Agg figure and axes, outside pyplot's
+#figure registry, so rendering thousands of reports neither opens windows nor accumulates figures
+_REPORT_AXES = None
+_REPORT_LOCK = threading.Lock()
+
+def _reportaxes():
+    global _REPORT_AXES
+    if _REPORT_AXES is None:
+        figure = Figure(figsize=(20,5))
+        FigureCanvasAgg(figure)
+        _REPORT_AXES = figure.add_subplot()
+    return _REPORT_AXES
+
+def _decimate(ax, x, y):
+    """
+        Supporting function for the plot functions, keeps one point per pixel of the axes
+        Args:
+            ax (matplotlib.axes.Axes): axes the points are drawn on
+            x, y (np.ndarray): numeric coordinates of the points, in drawing order
+        Returns:
+            (np.ndarray): indices of the points kept, in drawing order
+    """
+    bbox = ax.get_window_extent()
+    width, height = max(int(bbox.width), 1), max(int(bbox.height), 1)
+    index = np.flatnonzero(~np.isnan(y))
+    if len(index) <= width:
+        return index
+    x, y = x[index], y[index]
+    column = ((x - x.min())/max(np.ptp(x), 1)*(width - 1)).astype(np.int64)
+    row = ((y - y.min())/max(np.ptp(y), 1)*(height - 1)).astype(np.int64)
+    keep = np.unique(column*height + row, return_index=True)[1]
+    return index[np.sort(keep)]
+
+def _render(draw, size, output, ax, dpi):
+    """
+        Supporting function for the plot functions, draws on the given axes, on the report figure saved to output,
+        or on a new pyplot figure that is shown
+    """
+    with matplotlib.rc_context({'font.size': size}):
+        if ax is not None:
+            draw(ax, True)
+            return ax
+        if output is not None:
+            #fast PNG compression: encoding dominates the rendering time of a report plot
+            png = isinstance(output, (str, os.PathLike)) and os.fspath(output).lower().endswith('.png')
+            with _REPORT_LOCK:
+                ax = _reportaxes()
+                ax.clear()
+                #decimate to the pixels of the saved image, not of the figure's default resolution
+                ax.figure.set_dpi(dpi)
+                draw(ax, True)
+                ax.figure.savefig(output, dpi=dpi, pil_kwargs={'compress_level': 1} if png else None)
+            return output
+        import matplotlib.pyplot as plt
+        plt.figure(figsize=(20,5))
+        draw(plt.gca(), False)
+        plt.show()
+
+def _points(ax, df, decimate):
+    #Time and Glucose of the points to draw, one per pixel when decimating
+    time = np.asarray(df['Time'], dtype='datetime64[s]')
+    glucose = np.asarray(df['Glucose'], dtype=float)
+    if decimate:
+        keep = _decimate(ax, time.astype(np.int64).astype(float), glucose)
+        time, glucose = time[keep], glucose[keep]
+    return time, glucose
+
+def plotglucosesd(df, sd=1, size=15, output=None, ax=None, dpi=100):
+    """
+        Plots glucose with specified standard deviation lines
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            sd (integer): standard deviation lines to plot (default=1)
+            size (integer): font size for plot (default=15)
+            output (String or file): path or file to save the plot to, without showing it (default=None)
+            ax (matplotlib.axes.Axes): axes to draw on, without showing them (default=None)
+            dpi (integer): resolution of the saved plot (default=100)
+        Returns:
+            plot of glucose with standard deviation lines (shown, or the output or ax it was drawn on)
+            
+    """
+    glucose_mean = np.mean(df['Glucose'])
+    up = np.mean(df['Glucose']) + sd*np.std(df['Glucose'])
+    dw = np.mean(df['Glucose']) - sd*np.std(df['Glucose'])
+
+    def draw(ax, decimate):
+        ax.plot(*_points(ax, df, decimate), '.', color = '#1f77b4')
+        ax.axhline(y=glucose_mean, color='red', linestyle='-')
+        ax.axhline(y=up, color='pink', linestyle='-')
+        ax.axhline(y=dw, color='pink', linestyle='-')
+        ax.set_ylabel('Glucose')
+    return _render(draw, size, output, ax, dpi)
+
+def plotglucosebounds(df, upperbound = 180, lowerbound = 70, size=15, output=None, ax=None, dpi=100):
+    """
+        Plots glucose with user-defined boundaries
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            upperbound (integer): user defined upper bound for glucose line to plot (default=180)
+            lowerbound (integer): user defined lower bound for glucose line to plot (default=70)
+            size (integer): font size for plot (default=15)
+            output (String or file): path or file to save the plot to, without showing it (default=None)
+            ax (matplotlib.axes.Axes): axes to draw on, without showing them (default=None)
+            dpi (integer): resolution of the saved plot (default=100)
+        Returns:
+            plot of glucose with user defined boundary lines (shown, or the output or ax it was drawn on)
+            
+    """
+    def draw(ax, decimate):
+        ax.plot(*_points(ax, df, decimate), '.', color = '#1f77b4')
+        ax.axhline(y=upperbound, color='red', linestyle='-')
+        ax.axhline(y=lowerbound, color='orange', linestyle='-')
+        ax.set_ylabel('Glucose')
+    return _render(draw, size, output, ax, dpi)
+
+def plotglucosesmooth(df, size=15, output=None, ax=None, dpi=100):
+    """
+        Plots smoothed glucose plot (with LOWESS smoothing, see smoothglucose)
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            size (integer): font size for plot (default=15)
+            output (String or file): path or file to save the plot to, without showing it (default=None)
+            ax (matplotlib.axes.Axes): axes to draw on, without showing them (default=None)
+            dpi (integer): resolution of the saved plot (default=100)
+        Returns:
+            LOWESS-smoothed plot of glucose (shown, or the output or ax it was drawn on)
+            
+    """
+    smoothed = smoothglucose(df)
+
+    def draw(ax, decimate):
+        ax.plot(*_points(ax, df, decimate), '.')
+        ax.plot(*_points(ax, smoothed, decimate), 'r')
+        ax.set_ylabel('Glucose')
+    return _render(draw, size, output, ax, dpi)
+
+def plotagp(df, binsize=5, smooth=None, upperbound=180, lowerbound=70, size=15, output=None, ax=None, dpi=100):
+    """
+        Plots the Ambulatory Glucose Profile: median, 25-75th and 5-95th percentile bands of glucose by time of day
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns (for a cohort profile, the
+                readings of all patients in one long dataframe)
+            binsize (integer): width of the time-of-day bins in minutes (default=5, see agp)
+            smooth (integer): width in bins of the moving average applied to the percentile curves (default=None, see agp)
+            upperbound (integer): upper bound of the target range line to plot (default=180)
+            lowerbound (integer): lower bound of the target range line to plot (default=70)
+            size (integer): font size for plot (default=15)
+            output (String or file): path or file to save the plot to, without showing it (default=None)
+            ax (matplotlib.axes.Axes): axes to draw on, without showing them (default=None)
+            dpi (integer): resolution of the saved plot (default=100)
+        Returns:
+            plot of the glucose percentiles by time of day (shown, or the output or ax it was drawn on)
+
+    """
+    profile = agp(df, AGP_PERCENTILES, binsize, smooth)
+    hours = profile.index.to_numpy()/60
+
+    def draw(ax, decimate):
+        ax.fill_between(hours, profile['p5'], profile['p95'], color='#1f77b4', alpha=0.2, linewidth=0)
+        ax.fill_between(hours, profile['p25'], profile['p75'], color='#1f77b4', alpha=0.45, linewidth=0)
+        ax.plot(hours, profile['p50'], color='#1f77b4')
+        ax.axhline(y=upperbound, color='red', linestyle='-')
+        ax.axhline(y=lowerbound, color='orange', linestyle='-')
+        ax.set_xlim(0, 24)
+        ax.set_xticks(range(0, 25, 3))
+        ax.set_xlabel('Hour of day')
+        ax.set_ylabel('Glucose')
+    return _render(draw, size, output, ax, dpi)
@@ -0,0 +1,152 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+"""
+    cgmquantify.preprocess
+    Description:
+    Sensor-gap detection, resampling onto a regular time grid and LOWESS smoothing. Resampled traces line up across
+    days (the grid is anchored at midnight), so MODD/CONGA24 pair readings exactly and TIR/TOR/POR/PIR count real
+    elapsed time.
+
+    Functions:
+    findgaps(): Finds sensor gaps (warm-up, dropouts) longer than a given length
+    resample(): Resamples glucose onto a regular grid, interpolating across short gaps only
+    smoothglucose(): Returns LOWESS-smoothed glucose, fitted at points delta minutes apart and interpolated between
+
+"""
+
+def findgaps(df, max_gap=15):
+    """
+        Finds sensor gaps (warm-up, dropouts) longer than a given length
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            max_gap (integer): longest interval between readings, in minutes, that is not a gap (default=15)
+        Returns:
+            (pd.DataFrame): one row per gap with Start (last reading before the gap), End (first reading after it) and Minutes columns
+
+    """
+    time = np.asarray(df['Time'], dtype='datetime64[s]')
+    glucose = np.asarray(df['Glucose'], dtype=float)
+    time = time[~np.isnan(glucose)]
+    minutes = np.diff(time).astype(np.int64)/60
+    gap = np.flatnonzero(minutes > max_gap)
+    return pd.DataFrame({'Start': time[gap], 'End': time[gap + 1], 'Minutes': minutes[gap]})
+
+def resample(df, sr=5, max_gap=30):
+    """
+        Resamples glucose onto a regular grid, interpolating across short gaps only
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            sr (integer): grid spacing in minutes (default=5)
+            max_gap (integer): longest interval between readings, in minutes, that is interpolated across (default=30)
+        Returns:
+            (pd.DataFrame): dataframe with Time (every sr minutes, aligned to midnight), Glucose, Day and Interpolated columns.
+                Glucose is linearly interpolated between the neighbouring readings and is NaN inside longer gaps;
+                Interpolated is True where the grid point falls inside a gap (more than 1.5 sampling intervals) that was filled
+
+    """
+    time = np.asarray(df['Time'], dtype='datetime64[s]').astype(np.int64)
+    glucose = np.asarray(df['Glucose'], dtype=float)
+    valid = ~np.isnan(glucose)
+    time, glucose = time[valid], glucose[valid]
+    order = np.argsort(time, kind='stable')
+    time, glucose = time[order], glucose[order]
+
+    step = int(sr*60)
+    if len(time):
+        grid = np.arange(-(-time[0]//step)*step, time[-1] + 1, step)
+        values = np.interp(grid, time, glucose)
+
+        #neighbouring readings of every grid point, found with one binary search
+        index = np.searchsorted(time, grid, side='left')
+        exact = time[np.minimum(index, len(time) - 1)] == grid
+        after = np.clip(index, 1, len(time) - 1)
+        interval = time[after] - time[after - 1]
+        values[(interval > max_gap*60) & ~exact] = np.nan
+        interpolated = (interval > 1.5*step) & ~exact & ~np.isnan(values)
+    else:
+        #no readings with glucose: an empty grid
+        grid, values, interpolated = np.array([], dtype=np.int64), np.array([]), np.array([], dtype=bool)
+
+    resampled = pd.DataFrame({'Time': grid.astype('datetime64[s]'), 'Glucose': values})
+    resampled['Day'] = resampled['Time'].dt.date
+    resampled['Interpolated'] = interpolated
+    return resampled
+
+#smoothed traces kept by smoothglucose(), keyed by content, so a plot and later metrics share one fit
+SMOOTH_CACHE_SIZE = 16
+_SMOOTH_CACHE = OrderedDict()
+
+def _lowessfit(x, y, k, fit):
+    """
+        Supporting function for smoothglucose, local linear regression with tricube weights over the k nearest
+        readings of each reading in fit (the same neighbourhoods and weights as statsmodels lowess with it=0)
+    """
+    #window of k readings for each fit point, slid right while the point is past the middle of the window ends
+    middle = (x[:len(x) - k] + x[k:])/2
+    left = np.searchsorted(middle, x[fit], side='left')
+    windows_x, windows_y = sliding_window_view(x, k), sliding_window_view(y, k)
+    fitted = np.empty(len(fit))
+    block = max(1, (1 << 21)//k)
+    for start in range(0, len(fit), block):
+        xv = x[fit[start:start + block]][:, None]
+        wx, wy = windows_x[left[start:start + block]], windows_y[left[start:start + block]]
+        radius = np.maximum(xv[:, 0] - wx[:, 0], wx[:, -1] - xv[:, 0])[:, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weights = (1 - (np.abs(wx - xv)/radius)**3)**3
+        weights = np.nan_to_num(weights)
+        ok = np.count_nonzero(weights > 1e-12, axis=1) >= 2
+        weights /= np.where(ok, weights.sum(axis=1), 1)[:, None]
+        mean = np.sum(weights*wx, axis=1)[:, None]
+        variance = np.maximum(np.sum(weights*(wx - mean)**2, axis=1), 1e-12)[:, None]
+        projection = weights*(1 + (xv - mean)*(wx - mean)/variance)
+        fitted[start:start + block] = np.where(ok, np.sum(projection*wy, axis=1), y[fit[start:start + block]])
+    return fitted
+
+def smoothglucose(df, frac=0.025, delta=None):
+    """
+        Returns LOWESS-smoothed glucose, fitted at points delta minutes apart and interpolated between
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            frac (float): fraction of the readings used for each local regression (default=0.025)
+            delta (float): minutes between fitted points; readings in between are linearly interpolated, which bounds
+                the error by the curvature of the fit over delta minutes (default=None, 1% of the smoothing window;
+                0 fits every reading, as statsmodels lowess with it=0)
+        Returns:
+            (pd.DataFrame): dataframe with Time, Glucose (smoothed) and Day columns for the readings with glucose
+
+    """
+    time = np.asarray(df['Time'], dtype='datetime64[ns]')
+    glucose = np.asarray(df['Glucose'], dtype=float)
+    valid = ~np.isnan(glucose)
+    time, glucose = time[valid], glucose[valid]
+    order = np.argsort(time, kind='stable')
+    time, glucose = time[order], glucose[order]
+
+    key = hashlib.sha256(time.tobytes() + glucose.tobytes() + repr((frac, delta)).encode()).hexdigest()
+    if key in _SMOOTH_CACHE:
+        _SMOOTH_CACHE.move_to_end(key)
+        smoothed = _SMOOTH_CACHE[key]
+    else:
+        #minutes from the first reading, so the regression sums stay well conditioned
+        x = (time - time[0]).astype(np.int64)/6e10 if len(time) else np.array([])
+        k = min(max(int(frac*len(x) + 1e-10), 2), len(x))
+        if len(x) < 2:
+            smoothed = glucose.copy()
+        else:
+            if delta is None:
+                delta = 0.01*(x[-1] - x[0])*k/len(x)
+            fit = np.arange(len(x)) if delta <= 0 else np.unique(np.append(
+                np.searchsorted(x, np.arange(x[0], x[-1], delta), side='left'), len(x) - 1))
+            smoothed = np.interp(x, x[fit], _lowessfit(x, glucose, k, fit))
+        _SMOOTH_CACHE[key] = smoothed
+        if len(_SMOOTH_CACHE) > SMOOTH_CACHE_SIZE:
+            _SMOOTH_CACHE.popitem(last=False)
+
+    result = pd.DataFrame({'Time': time, 'Glucose': smoothed})
+    result['Day'] = result['Time'].dt.date
+    return result
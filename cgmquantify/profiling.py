@@ -0,0 +1,184 @@
+import functools
+import inspect
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from .metrics import _METRICS, _INTERMEDIATES
+from .series import CGMSeries
+
+"""
+    cgmquantify.profiling
+    Description:
+    Opt-in instrumentation of the public functions, the metrics computed inside compute_all() and the shared
+    intermediates they resolve. While a Profiler is running the functions are replaced by timed wrappers in the
+    package and submodule namespaces; when none is running the original functions are restored, so there is no
+    overhead at all. Functions imported by name before profiling started (from cgmquantify import MAGE) keep
+    calling the original and are not recorded.
+
+    Each call records the function name, wall time in seconds, rows processed (length of the dataframe, series or
+    array passed in, or of the dataframe returned when a file name is passed) and, with memory=True, the peak of
+    memory allocated during the call (traced with tracemalloc, which slows calls down).
+
+    Classes:
+    Profiler: Collects records while running, as a context manager or with start()/stop(), and summarizes them
+
+"""
+
+_PROFILERS = []
+_ORIGINALS = []
+#peak traced memory of the calls in progress, innermost last (tracemalloc has one global peak, reset per call)
+_PEAKS = []
+
+def _rows(args, result):
+    for value in (args[0] if args else None, result):
+        if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray, CGMSeries)):
+            return len(value)
+        if not isinstance(value, (str, bytes)) and not hasattr(value, '__fspath__'):
+            return None
+    return None
+
+def _record(record):
+    for profiler in _PROFILERS:
+        profiler.add(record)
+
+def _timed(name, func):
+    """
+        Supporting function for Profiler, wraps func so that each call is recorded under name
+    """
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        memory = any(profiler.memory for profiler in _PROFILERS) and tracemalloc.is_tracing()
+        if memory:
+            current, outer_peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            _PEAKS.append(0)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            peak = None
+            if memory:
+                peak = max(tracemalloc.get_traced_memory()[1], _PEAKS.pop())
+                if _PEAKS:
+                    #the reset above hid the outer call's peak so far; hand it back up the stack
+                    _PEAKS[-1] = max(_PEAKS[-1], outer_peak, peak)
+                peak -= current
+        _record({'function': name, 'seconds': seconds, 'rows': _rows(args, result), 'peak_bytes': peak})
+        return result
+    return timed
+
+def _install():
+    package = sys.modules[__package__]
+    modules = [m for n, m in list(sys.modules.items()) if m is not None and (n == __package__ or n.startswith(__package__ + '.'))]
+    wrapped = {}
+    for name, obj in list(vars(package).items()):
+        if not name.startswith('_') and inspect.isfunction(obj) and obj.__module__.startswith(__package__):
+            wrapped[id(obj)] = (obj, _timed(name, obj))
+    for module in modules:
+        for name, obj in list(vars(module).items()):
+            if id(obj) in wrapped and wrapped[id(obj)][0] is obj:
+                _ORIGINALS.append((vars(module), name, obj))
+                setattr(module, name, wrapped[id(obj)][1])
+    for table, prefix, position in ((_METRICS, 'compute_all.', 1), (_INTERMEDIATES, 'intermediate.', 0)):
+        for name, entry in list(table.items()):
+            _ORIGINALS.append((table, name, entry))
+            entry = list(entry)
+            entry[position] = _timed(prefix + name, entry[position])
+            table[name] = tuple(entry)
+
+def _uninstall():
+    while _ORIGINALS:
+        namespace, name, obj = _ORIGINALS.pop()
+        namespace[name] = obj
+
+class Profiler:
+    """
+        Records wall time, rows processed and peak allocation of every call to a public cgmquantify function,
+        every metric computed by compute_all() (as compute_all.<metric>) and every shared intermediate (as
+        intermediate.<name>) while running
+        Args:
+            callback (function): called with each record (a dict with function, seconds, rows and peak_bytes),
+                e.g. to export to a metrics system (default=None)
+            memory (bool): trace peak allocation with tracemalloc (default=False, peak_bytes is None)
+
+        Example:
+            with Profiler() as profiler:
+                for f in files:
+                    compute_all(importdexcom(f))
+            print(profiler.summary())
+    """
+
+    def __init__(self, callback=None, memory=False):
+        self.callback = callback
+        self.memory = memory
+        self.records = []
+        self._started_tracing = False
+
+    def start(self):
+        """
+            Starts recording (instrumenting the package if no other Profiler is running)
+        """
+        if self in _PROFILERS:
+            return self
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if not _PROFILERS:
+            _install()
+        _PROFILERS.append(self)
+        return self
+
+    def stop(self):
+        """
+            Stops recording (restoring the original functions once no Profiler is running)
+        """
+        if self in _PROFILERS:
+            _PROFILERS.remove(self)
+            if not _PROFILERS:
+                _uninstall()
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def add(self, record):
+        """
+            Adds a record (from this process or returned by a worker process) and passes it to the callback
+        """
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def summary(self):
+        """
+            Summarizes the records per function
+            Returns:
+                (pd.DataFrame): one row per function, slowest total first, with calls, total, mean and max seconds,
+                    rows, rows per second and the largest peak allocation in bytes
+
+        """
+        columns = ['calls', 'total_seconds', 'mean_seconds', 'max_seconds', 'rows', 'rows_per_second', 'peak_bytes']
+        if not self.records:
+            return pd.DataFrame(columns=columns, index=pd.Index([], name='function'))
+        records = pd.DataFrame(self.records, columns=['function', 'seconds', 'rows', 'peak_bytes'])
+        records[['rows', 'peak_bytes']] = records[['rows', 'peak_bytes']].astype(float)
+        grouped = records.groupby('function')
+        summary = pd.DataFrame({'calls': grouped.size(),
+                                'total_seconds': grouped['seconds'].sum(),
+                                'mean_seconds': grouped['seconds'].mean(),
+                                'max_seconds': grouped['seconds'].max(),
+                                'rows': grouped['rows'].sum(min_count=1),
+                                'peak_bytes': grouped['peak_bytes'].max()})
+        summary['rows_per_second'] = summary['rows']/summary['total_seconds']
+        return summary[columns].sort_values('total_seconds', ascending=False)
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+from .metrics import _durations
+from .grouped import _groupdurations, _segments, _withids
+
+"""
+    cgmquantify.ranges
+    Description:
+    Fixed-threshold glucose ranges, such as the international consensus bands (<54, 54-69, 70-180, 181-250 and
+    >250 mg/dL), and the Glycemia Risk Index. Every reading is binned once against the thresholds with
+    np.searchsorted and the time in all bands is summed with one np.bincount, for the whole trace, per day or per
+    patient of a long multi-patient dataframe.
+
+    Functions:
+    rangemetrics(): Computes time and percent time in every glucose band, and GRI for the consensus bands
+    GRI(): Computes and returns the Glycemia Risk Index
+
+"""
+
+#edges of the consensus bands <54, 54-69, 70-180, 181-250 and >250 mg/dL: 54 and 70 start the band above them,
+#180 and 250 end the band below them (<=180, <=250), so fractional mg/dL converted from mmol/L (e.g. 180.72) are
+#binned the way the consensus defines the bands
+CONSENSUS_THRESHOLDS = (54, 70, 180, 250)
+CONSENSUS_UPPER_EDGES = (180, 250)
+
+def _bandlabels(thresholds, upper):
+    #'54-69' style labels for whole-number edges, '[3.9, 10)' style otherwise; upper[i] is True where a reading
+    #equal to edge i belongs to the band below it
+    if all(float(t).is_integer() for t in thresholds):
+        edges = [int(t) for t in thresholds]
+        return (['<%d' % (edges[0] + upper[0])]
+                + ['%d-%d' % (lo + upper[i], hi - (not upper[i + 1]))
+                   for i, (lo, hi) in enumerate(zip(edges[:-1], edges[1:]))]
+                + ['>%d' % (edges[-1] - (not upper[-1]))])
+    return (['<=%g' % thresholds[0] if upper[0] else '<%g' % thresholds[0]]
+            + ['%s%g, %g%s' % ('(' if upper[i] else '[', lo, hi, ']' if upper[i + 1] else ')')
+               for i, (lo, hi) in enumerate(zip(thresholds[:-1], thresholds[1:]))]
+            + ['>%g' % thresholds[-1] if upper[-1] else '>=%g' % thresholds[-1]])
+
+def rangemetrics(df, thresholds=CONSENSUS_THRESHOLDS, sr=5, by=None, upper_edges=None):
+    """
+        Computes time and percent time in every glucose band, and GRI for the consensus bands
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            thresholds (list): increasing edges between the bands; a reading equal to an edge belongs to the band
+                above it unless the edge is in upper_edges (default=CONSENSUS_THRESHOLDS, <54, 54-69, 70-180,
+                181-250, >250)
+            sr (integer): sampling rate (default=5[minutes, once every 5 minutes glucose is recorded]; None uses the actual time between readings)
+            by (String): None for the whole trace, 'Day' for one row per day, or the name of a patient id column
+                for one row per patient of a long dataframe, leaving out readings with a missing id (default=None)
+            upper_edges (list): thresholds that end the band below them, so a reading equal to one stays in the lower
+                band (default=None, CONSENSUS_UPPER_EDGES for the consensus thresholds, none otherwise)
+        Returns:
+            (pd.Series or pd.DataFrame): time_<band> (minutes) and percent_<band> (% of the time with readings) for
+                every band, and GRI, GRI_hypo and GRI_hyper when the thresholds are the consensus ones; one row per
+                day or patient when by is given
+
+    """
+    thresholds = np.asarray(thresholds, dtype=float)
+    if np.any(np.diff(thresholds) <= 0):
+        raise ValueError('Thresholds must be increasing')
+    consensus = tuple(thresholds) == CONSENSUS_THRESHOLDS
+    if upper_edges is None:
+        upper_edges = CONSENSUS_UPPER_EDGES if consensus else ()
+    upper = np.isin(thresholds, np.asarray(upper_edges, dtype=float))
+    consensus = consensus and tuple(thresholds[upper]) == CONSENSUS_UPPER_EDGES
+    if by is not None and by != 'Day':
+        df = _withids(df, by)
+    time = np.asarray(df['Time'], dtype='datetime64[s]').astype(np.int64)
+    glucose = np.asarray(df['Glucose'], dtype=float)
+    valid = ~np.isnan(glucose)
+
+    if by is None or by == 'Day':
+        if sr is None:
+            weights = _durations(df, glucose)
+        if by is None:
+            groups, index = np.zeros(len(glucose), dtype=np.int64), None
+        else:
+            days, groups = np.unique(time.astype('datetime64[s]').astype('datetime64[D]'), return_inverse=True)
+            groups, index = groups.ravel(), pd.DatetimeIndex(days, name='Day')
+    else:
+        groups, patients = pd.factorize(df[by], sort=True)
+        index = pd.Index(patients, name=by)
+        if sr is None:
+            order = np.lexsort((time, groups))
+            weights = np.empty(len(glucose))
+            weights[order] = _groupdurations(time[order], groups[order], _segments(groups[order]), valid[order])
+    if sr is not None:
+        weights = np.full(len(glucose), float(sr))
+    ngroups = 1 if index is None else len(index)
+
+    #one binary search bins every reading (a reading equal to an edge lands below it, and moves up unless the edge
+    #is an upper edge); one bincount sums every band of every group
+    nbands = len(thresholds) + 1
+    band = np.searchsorted(thresholds, glucose[valid], side='left')
+    edge = np.minimum(band, len(thresholds) - 1)
+    band += (glucose[valid] == thresholds[edge]) & ~upper[edge]
+    key = groups[valid]*nbands + band
+    minutes = np.bincount(key, weights=weights[valid], minlength=ngroups*nbands).reshape(ngroups, nbands)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        percent = minutes/minutes.sum(axis=1, keepdims=True)*100
+
+    labels = _bandlabels(list(thresholds), list(upper))
+    results = {}
+    for i, label in enumerate(labels):
+        results['time_' + label] = minutes[:, i]
+    for i, label in enumerate(labels):
+        results['percent_' + label] = percent[:, i]
+    if consensus:
+        vlow, low, target, high, vhigh = percent.T
+        results['GRI_hypo'] = vlow + 0.8*low
+        results['GRI_hyper'] = vhigh + 0.5*high
+        results['GRI'] = np.minimum(3.0*results['GRI_hypo'] + 1.6*results['GRI_hyper'], 100)
+
+    table = pd.DataFrame(results, index=index)
+    if by is None:
+        return table.iloc[0].rename(None)
+    return table
+
+def GRI(df, sr=5):
+    """
+        Computes and returns the Glycemia Risk Index (Klonoff et al. 2023) from the consensus bands
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            sr (integer): sampling rate (default=5[minutes, once every 5 minutes glucose is recorded]; None uses the actual time between readings)
+        Returns:
+            GRI (float): 3.0 x %<54 + 2.4 x %54-69 + 1.6 x %>250 + 0.8 x %181-250, at most 100
+
+    """
+    GRI = rangemetrics(df, CONSENSUS_THRESHOLDS, sr)['GRI']
+    return GRI
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+from .metrics import riskkernel, _bounds
+
+"""
+    cgmquantify.rolling
+    Description:
+    Computes trailing-window metrics (e.g. 14-day GMI) for every day of a trace in one pass, using cumulative sums
+    for the moments and risk values and a sliding histogram of glucose values for the range metrics.
+
+    Functions:
+    rollingmetrics(): Computes metrics over a trailing time window ending at each day
+
+"""
+
+ROLLING_METRICS = ['interdaysd', 'interdaycv', 'J_index', 'GMI', 'eA1c', 'LBGI', 'HBGI',
+                   'TIR', 'TOR', 'POR', 'PIR', 'MGE', 'MGN']
+
+_RANGE_METRICS = {'TIR', 'TOR', 'POR', 'PIR', 'MGE', 'MGN'}
+
+def _windowsums(x, lo, hi):
+    """
+        Supporting function for rollingmetrics, sums x over every window [lo, hi) from one cumulative sum
+    """
+    cumulative = np.concatenate([[0], np.cumsum(x)])
+    return cumulative[hi] - cumulative[lo]
+
+def rollingmetrics(df, window='14D', metrics=None, sd=1, sr=5, min_periods=None):
+    """
+        Computes metrics over a trailing time window ending at each day
+        Args:
+            (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            window (String or timedelta): length of the trailing window (default='14D')
+            metrics (list): names of metrics to compute (default=None, all of ROLLING_METRICS)
+            sd (integer): standard deviation for computing range, used by TIR, TOR, POR, PIR, MGE, MGN (default=1)
+            sr (integer): sampling rate, used by TIR and TOR (default=5[minutes, once every 5 minutes glucose is recorded])
+            min_periods (integer): readings with glucose a window needs for its metrics (default=None, the window
+                must lie within the trace: the first days, before a whole window of data exists, are NaN)
+        Returns:
+            (pd.DataFrame): one row per day, indexed by day, holding the metrics over the window that ends at the end
+                of that day (NaN for windows that are too short, see min_periods) and n, the readings with glucose in
+                the window
+
+    """
+    if metrics is None:
+        metrics = ROLLING_METRICS
+    unknown = [m for m in metrics if m not in ROLLING_METRICS]
+    if unknown:
+        raise ValueError('Metrics not available as rolling metrics: ' + ', '.join(unknown))
+
+    time = np.asarray(df['Time'], dtype='datetime64[ns]')
+    glucose = np.asarray(df['Glucose'], dtype=float)
+    order = np.argsort(time, kind='stable')
+    time, glucose = time[order], glucose[order]
+    if len(time) == 0:
+        return pd.DataFrame(columns=list(metrics) + ['n'], index=pd.DatetimeIndex([], name='Day'), dtype=float)
+
+    #window [end - window, end) for every day, located with two binary searches
+    days = np.arange(time[0].astype('datetime64[D]'), time[-1].astype('datetime64[D]') + 1)
+    ends = (days + 1).astype('datetime64[ns]')
+    starts = ends - pd.Timedelta(window).to_timedelta64()
+    lo = np.searchsorted(time, starts, side='left')
+    hi = np.searchsorted(time, ends, side='left')
+
+    #moments from cumulative sums, shifted by the overall mean to keep the sum of squares well conditioned
+    valid = ~np.isnan(glucose)
+    shift = np.mean(glucose[valid])
+    shifted = np.where(valid, glucose - shift, 0.0)
+    total = hi - lo
+    n = _windowsums(valid, lo, hi)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        s1 = _windowsums(shifted, lo, hi)/n
+        s2 = _windowsums(shifted**2, lo, hi)/n
+        mean = shift + s1
+        std = np.sqrt(np.maximum(s2 - s1**2, 0))
+
+    results = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if 'LBGI' in metrics or 'HBGI' in metrics:
+            rl, rh = riskkernel(glucose)
+            results['LBGI'] = _windowsums(rl, lo, hi)/total
+            results['HBGI'] = _windowsums(rh, lo, hi)/total
+        results['interdaysd'] = std
+        results['interdaycv'] = (std/mean)*100
+        results['J_index'] = 0.001*((mean+std)**2)
+        results['GMI'] = 3.31 + (0.02392*mean)
+        results['eA1c'] = (46.7 + mean)/ 28.7
+
+    if _RANGE_METRICS.intersection(metrics):
+        #sliding histogram of glucose values: each reading enters and leaves the window once
+        values, value_codes = np.unique(glucose[valid], return_inverse=True)
+        codes = np.full(len(glucose), -1)
+        codes[valid] = value_codes.ravel()
+        histogram = np.zeros(len(values))
+        ranges = {name: np.full(len(days), np.nan) for name in _RANGE_METRICS}
+        previous_lo = previous_hi = 0
+        for i in range(len(days)):
+            entering = codes[previous_hi:hi[i]]
+            leaving = codes[previous_lo:lo[i]]
+            histogram += np.bincount(entering[entering >= 0], minlength=len(values))
+            histogram -= np.bincount(leaving[leaving >= 0], minlength=len(values))
+            previous_lo, previous_hi = lo[i], hi[i]
+            if total[i] == 0:
+                continue
+            dw, up = _bounds((mean[i], std[i]), sd)
+            inrange = (values <= up) & (values >= dw)
+            outrange = (values >= up) | (values <= dw)
+            inside, outside = histogram[inrange].sum(), histogram[outrange].sum()
+            ranges['TIR'][i] = inside*sr
+            ranges['TOR'][i] = outside*sr
+            ranges['POR'][i] = (outside/total[i])*100
+            ranges['PIR'][i] = (inside/total[i])*100
+            with np.errstate(invalid='ignore', divide='ignore'):
+                ranges['MGE'][i] = np.sum(values[outrange]*histogram[outrange])/outside
+                ranges['MGN'][i] = np.sum(values[inrange]*histogram[inrange])/inside
+        results.update(ranges)
+
+    #a 14-day window over the first day of a trace holds one day of data; it is not reported as a 14-day value
+    if min_periods is None:
+        short = starts < days[0].astype('datetime64[ns]')
+    else:
+        short = n < min_periods
+    table = pd.DataFrame({name: results[name] for name in metrics}, index=pd.DatetimeIndex(days, name='Day'))
+    table[short] = np.nan
+    table['n'] = n
+    return table
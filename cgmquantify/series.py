@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+"""
+    cgmquantify.series
+    Description:
+    A compact, array-backed container for one CGM trace that every metric function accepts in place of a DataFrame.
+
+    Classes:
+    CGMSeries: Time-sorted int64 epoch seconds, float32 glucose and precomputed day offsets
+
+"""
+
+class CGMSeries:
+    """
+        Compact container for one CGM trace, usable wherever a dataframe from importdexcom() is accepted.
+        Readings are sorted by time and stored as int64 epoch seconds and float32 glucose; the start of each
+        day is precomputed so per-day metrics need no grouping.
+
+        Columns are available by name like a dataframe (series['Time'], series['Glucose'], series['Day']),
+        and indexing with a boolean mask returns a new CGMSeries.
+
+        Args:
+            time (array-like): timestamps of the readings
+            glucose (array-like): glucose values
+    """
+
+    __slots__ = ('epoch', 'glucose', 'day_starts')
+
+    def __init__(self, time, glucose):
+        epoch = np.asarray(time, dtype='datetime64[s]').astype(np.int64)
+        glucose = np.asarray(glucose, dtype=np.float32)
+        if len(epoch) and np.any(epoch[1:] < epoch[:-1]):
+            order = np.argsort(epoch, kind='stable')
+            epoch, glucose = epoch[order], glucose[order]
+        self.epoch = epoch
+        self.glucose = glucose
+        days = epoch // 86400
+        self.day_starts = np.flatnonzero(np.diff(days, prepend=days[:1] - 1))
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """
+            Builds a CGMSeries from a dataframe with Time and Glucose columns (e.g. from importdexcom())
+            Args:
+                (pd.DataFrame): dataframe of data with DateTime, Time and Glucose columns
+            Returns:
+                (CGMSeries)
+        """
+        return cls(df['Time'], df['Glucose'])
+
+    def to_dataframe(self):
+        """
+            Returns the trace as a dataframe with Time, Glucose and Day columns
+        """
+        return pd.DataFrame({'Time': self['Time'], 'Glucose': self['Glucose'], 'Day': self['Day']})
+
+    def __len__(self):
+        return len(self.epoch)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key == 'Time':
+                return pd.Series(self.epoch.view('datetime64[s]'), name='Time')
+            if key == 'Glucose':
+                #stored compactly, computed on in float64 like a dataframe column
+                return pd.Series(self.glucose, dtype=np.float64, name='Glucose')
+            if key == 'Day':
+                return pd.Series(self.epoch.view('datetime64[s]').astype('datetime64[D]'), name='Day').dt.date
+            raise KeyError(key)
+        mask = np.asarray(key)
+        return CGMSeries(self.epoch.view('datetime64[s]')[mask], self.glucose[mask])
+
+    def daycodes(self):
+        """
+            Returns the day number (0, 1, ...) of every reading, from the precomputed day offsets
+        """
+        return np.repeat(np.arange(len(self.day_starts)), np.diff(np.append(self.day_starts, len(self.epoch))))
+
+    def __repr__(self):
+        return 'CGMSeries(%d readings, %d days)' % (len(self.epoch), len(self.day_starts))
@@ -0,0 +1,250 @@
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from .io import importdexcom
+from .metrics import compute_all, _metriclist
+
+"""
+    cgmquantify.service
+    Description:
+    Asyncio API and a small local HTTP server for computing metrics on uploaded Dexcom exports. Parsing and
+    metrics run on a bounded process pool, so a large upload never blocks the event loop or other requests;
+    at most max_pending requests are admitted at once (the rest wait, up to their timeout), and every request has
+    a deadline. Uploads are parsed from memory, without temporary files.
+
+    Functions:
+    compute_metrics_async(): Computes metrics for a Dexcom export given as a path or as bytes, without blocking the event loop
+    serve(): Runs the HTTP server until cancelled
+
+    Classes:
+    MetricsService: Bounded executor, admission limit and timeout shared by the requests of one server
+
+    Usage:
+    python -m cgmquantify.service --port 8080 --processes 4
+    curl --data-binary @export.csv 'http://127.0.0.1:8080/metrics?metrics=GMI,TIR'
+
+"""
+
+#largest upload accepted by the HTTP server (a year of 5-minute Dexcom readings is about 10MB)
+MAX_BYTES = 64*1024*1024
+
+def _compute(source, metrics, params):
+    """
+        Worker function for MetricsService: imports one export (path or bytes) and computes its metrics
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    return compute_all(importdexcom(source), metrics, **params)
+
+class MetricsService:
+    """
+        Bounded executor, admission limit and timeout shared by the requests of one server
+        Args:
+            processes (integer): worker processes (default=None, one per CPU)
+            max_pending (integer): requests admitted at once, queued or running (default=None, twice the workers)
+            timeout (float): seconds a request may wait for admission and computation together; the HTTP server
+                also allows this long for reading a request's header and for reading its body (default=60)
+            executor (concurrent.futures.Executor): executor to run on instead of a new process pool, e.g. a
+                ThreadPoolExecutor (default=None)
+    """
+
+    def __init__(self, processes=None, max_pending=None, timeout=60, executor=None):
+        workers = processes or os.cpu_count() or 1
+        self.processes = processes
+        self.max_pending = max_pending or 2*workers
+        self.timeout = timeout
+        self._executor = executor
+        self._slots = None
+        self._loop = None
+
+    def _admission(self):
+        #one semaphore per event loop (asyncio primitives cannot be shared across loops)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._slots = loop, asyncio.Semaphore(self.max_pending)
+        return loop, self._slots
+
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.processes)
+        return self._executor
+
+    async def compute(self, source, metrics=None, sd=1, sr=5, std=1, timeout=None):
+        """
+            Computes metrics for a Dexcom export on the executor
+            Args:
+                source (String or bytes): path to the export, or its content
+                metrics (list): names of metric functions to compute (default=None, all metrics, see compute_all)
+                sd, sr, std: as in compute_all()
+                timeout (float): seconds for this request (default=None, the service timeout)
+            Returns:
+                results (pd.Series): metric values indexed by name, as compute_all() returns them
+            Raises:
+                TimeoutError: the request was not admitted or not finished within the timeout
+
+        """
+        metrics = _metriclist(metrics)
+        timeout = self.timeout if timeout is None else timeout
+        loop, slots = self._admission()
+        deadline = loop.time() + timeout
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError('Service busy: %d requests pending' % self.max_pending)
+
+        def release(_):
+            #the slot is freed when the work really ends, not when the caller gives up waiting for it
+            try:
+                loop.call_soon_threadsafe(slots.release)
+            except RuntimeError:
+                pass
+        try:
+            future = self.executor().submit(_compute, source, metrics, {'sd': sd, 'sr': sr, 'std': std})
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            raise TimeoutError('Metrics not computed within %g seconds' % timeout)
+
+    def close(self):
+        """
+            Shuts the executor down, cancelling queued work
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+_SERVICE = []
+
+async def compute_metrics_async(path_or_bytes, metrics=None, sd=1, sr=5, std=1, timeout=None):
+    """
+        Computes metrics for a Dexcom export given as a path or as bytes, without blocking the event loop
+        Args:
+            path_or_bytes (String or bytes): path to the export, or its content (e.g. an uploaded file)
+            metrics (list): names of metric functions to compute (default=None, all metrics, see compute_all)
+            sd (integer): standard deviation for computing range, used by TIR, TOR, POR, PIR, MGE, MGN (default=1)
+            sr (integer): sampling rate, used by TIR, TOR, POR, PIR (default=5)
+            std (integer): standard deviation for computing range, used by MAGE (default=1)
+            timeout (float): seconds to wait for the result (default=None, 60)
+        Returns:
+            results (pd.Series): metric values indexed by name, as compute_all() returns them
+
+    """
+    if not _SERVICE:
+        _SERVICE.append(MetricsService())
+    return await _SERVICE[0].compute(path_or_bytes, metrics, sd=sd, sr=sr, std=std, timeout=timeout)
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 408: 'Request Timeout',
+            411: 'Length Required', 413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+async def _respond(writer, status, body):
+    data = json.dumps(body).encode()
+    writer.write(('HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\nConnection: close\r\n\r\n'
+                  % (status, _REASONS[status], len(data))).encode() + data)
+    await writer.drain()
+
+async def _handle(service, max_bytes, reader, writer):
+    """
+        Supporting function for serve, answers one request per connection:
+        GET /health, and POST /metrics?metrics=GMI,TIR&sd=1&sr=5&std=1 with the export as the request body
+    """
+    try:
+        #a stalled or slow client must not hold its connection and buffer forever, so reads have the service timeout
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), service.timeout)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            return
+        except asyncio.TimeoutError:
+            return await _respond(writer, 408, {'error': 'Header not received within %g seconds' % service.timeout})
+        lines = head.decode('latin-1').split('\r\n')
+        method, target = lines[0].split(' ')[:2]
+        headers = dict((k.strip().lower(), v.strip()) for k, v in (l.split(':', 1) for l in lines[1:] if ':' in l))
+        url = urlsplit(target)
+        if url.path == '/health':
+            return await _respond(writer, 200, {'status': 'ok'})
+        if url.path != '/metrics':
+            return await _respond(writer, 404, {'error': 'Not found: %s' % url.path})
+        if method != 'POST':
+            return await _respond(writer, 405, {'error': 'POST the export to /metrics'})
+        if 'content-length' not in headers:
+            return await _respond(writer, 411, {'error': 'Content-Length required'})
+        length = headers['content-length']
+        if not (length.isascii() and length.isdigit()):
+            return await _respond(writer, 400, {'error': 'Invalid Content-Length: %s' % length})
+        length = int(length)
+        if length > max_bytes:
+            return await _respond(writer, 413, {'error': 'Upload larger than %d bytes' % max_bytes})
+        try:
+            body = await asyncio.wait_for(reader.readexactly(length), service.timeout)
+        except asyncio.TimeoutError:
+            return await _respond(writer, 408, {'error': 'Upload not received within %g seconds' % service.timeout})
+
+        query = parse_qs(url.query)
+        params = {'metrics': None}
+        try:
+            if 'metrics' in query:
+                params['metrics'] = [m for value in query['metrics'] for m in value.split(',') if m]
+            #std counts readings in MAGE's moving window, so it must be a whole number
+            for name, parse in (('sd', float), ('sr', float), ('std', int)):
+                if name in query:
+                    params[name] = None if query[name][0].lower() == 'none' else parse(query[name][0])
+            results = await service.compute(body, **params)
+        except TimeoutError as e:
+            return await _respond(writer, 503, {'error': str(e)})
+        except Exception as e:
+            return await _respond(writer, 400, {'error': '%s: %s' % (type(e).__name__, e)})
+        values = {name: (None if math.isnan(value) else float(value)) for name, value in results.items()}
+        await _respond(writer, 200, {'metrics': values})
+    except Exception as e:
+        await _respond(writer, 500, {'error': '%s: %s' % (type(e).__name__, e)})
+    finally:
+        writer.close()
+
+async def serve(host='127.0.0.1', port=8080, processes=None, max_pending=None, timeout=60, max_bytes=MAX_BYTES):
+    """
+        Runs the HTTP server until cancelled
+        Args:
+            host (String): address to listen on (default='127.0.0.1')
+            port (integer): port to listen on (default=8080)
+            processes (integer): worker processes (default=None, one per CPU)
+            max_pending (integer): requests admitted at once; later ones wait and get 503 at their timeout (default=None, twice the workers)
+            timeout (float): seconds per request, and for reading its header and its upload (default=60)
+            max_bytes (integer): largest upload accepted (default=MAX_BYTES)
+
+    """
+    service = MetricsService(processes, max_pending, timeout)
+    server = await asyncio.start_server(lambda r, w: _handle(service, max_bytes, r, w), host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m cgmquantify.service',
+                                     description='Serve cgmquantify metrics for uploaded Dexcom exports over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8080, help='port to listen on (default: 8080)')
+    parser.add_argument('-p', '--processes', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--max-pending', type=int, default=None, help='requests admitted at once (default: twice the workers)')
+    parser.add_argument('--timeout', type=float, default=60, help='seconds per request (default: 60)')
+    parser.add_argument('--max-bytes', type=int, default=MAX_BYTES, help='largest upload in bytes (default: 64MiB)')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.processes, args.max_pending, args.timeout, args.max_bytes))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
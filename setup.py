@@ -21,6 +21,10 @@ setup(name='cgmquantify',
       author_email='brinnae.bent@duke.edu',
       license='MIT',
       packages=['cgmquantify'],
-      install_requires=['pandas','numpy','matplotlib','datetime','statsmodels',
+      install_requires=['pandas','numpy','matplotlib','datetime',
                         ],
+      extras_require={'parquet': ['pyarrow'],
+                      'numba': ['numba'],
+                      'test': ['pytest','pytest-benchmark','statsmodels'],
+                        },
       zip_safe=False)
\ No newline at end of file
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import matplotlib
+matplotlib.use('Agg')
+#the riskkernel benchmark launches the parallel Numba kernel and later tests fork process pools (see
+#cgmquantify.metrics.USE_NUMBA)
+os.environ.setdefault('NUMBA_THREADING_LAYER', 'workqueue')
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cgmquantify as cgm
+from synthetic import write_dexcom
+from reference import reference
+
+#test_code.py is a script that prints metrics for test_file.csv, not a pytest module
+collect_ignore = ['test_code.py']
+
+SCALES = {'1d': 1, '14d': 14, '90d': 90, '1y': 365}
+
+@pytest.fixture(scope='session', params=list(SCALES))
+def trace(request, tmp_path_factory):
+    """
+        Synthetic Dexcom export at each scale: (scale name, path, imported dataframe, reference metric values)
+    """
+    path = write_dexcom(str(tmp_path_factory.mktemp('cgm') / ('%s.csv' % request.param)), SCALES[request.param])
+    df = cgm.importdexcom(path)
+    return request.param, path, df, reference(df)
@@ -0,0 +1,103 @@
+import numpy as np
+
+"""
+    Straightforward reference implementations of the cgmquantify metrics, written with plain loops and pandas
+    groupby, used by the benchmark suite to check the optimized functions.
+"""
+
+def _bounds(g, sd):
+    return np.nanmean(g) - sd*np.nanstd(g), np.nanmean(g) + sd*np.nanstd(g)
+
+def _risk(g):
+    rl, rh = [], []
+    for x in g:
+        f = (np.log(x)**1.084) - 5.381
+        rl.append(22.77*f**2 if f <= 0 else 0)
+        rh.append(22.77*f**2 if f > 0 else 0)
+    return np.array(rl), np.array(rh)
+
+def _daily(df, func):
+    return np.array([func(day['Glucose'].to_numpy(dtype=float)) for _, day in df.groupby(df['Time'].dt.date)])
+
+def _stats(values):
+    return np.mean(values), np.median(values), np.std(values)
+
+def _modd_n(df):
+    t = df['Time']
+    minutes = t.dt.hour*60 + t.dt.minute + (t.dt.second > 30)
+    per_minute = df['Glucose'].groupby(minutes, sort=False).apply(lambda x: x.diff().abs().mean())
+    per_minute.iloc[0] = np.nan
+    return per_minute.to_numpy()
+
+def _mage(g, stdev=1):
+    peaks = list((np.diff(np.sign(np.diff(g))) < 0).nonzero()[0] + 1)
+    valleys = list((np.diff(np.sign(np.diff(g))) > 0).nonzero()[0] + 1)
+    points = [(index, g[k], 'P') for k, index in enumerate(peaks)]
+    points += [(index, g[k + len(peaks)], 'V') for k, index in enumerate(valleys)]
+    points.sort()
+    turning = []
+    for i in range(stdev, len(points) - stdev):
+        positions = [i - stdev, i, i + stdev]
+        for j in range(len(positions) - 1):
+            a, b = points[positions[j]], points[positions[j + 1]]
+            if a[2] == b[2]:
+                if a[2] == 'P' or a[1] > b[1]:
+                    turning.append(b)
+                else:
+                    turning.append(a)
+    if len(turning) < 10:
+        turning, count = points, len(points)
+    else:
+        count = len(points)/2
+    return round(sum(dict((p[0], p[1]) for p in turning).values())/count, 3)
+
+def _consensus(g):
+    g = g[~np.isnan(g)]
+    percent = [np.mean(g < 54)*100, np.mean((g >= 54) & (g < 70))*100, np.mean((g >= 70) & (g <= 180))*100,
+               np.mean((g > 180) & (g <= 250))*100, np.mean(g > 250)*100]
+    gri = min(3.0*percent[0] + 2.4*percent[1] + 1.6*percent[4] + 0.8*percent[3], 100)
+    return percent, gri
+
+def _agp(df):
+    t = df['Time']
+    bins = ((t.dt.hour*60 + t.dt.minute + (t.dt.second > 30)) % 1440)//5*5
+    return df['Glucose'].groupby(bins).quantile([0.05, 0.25, 0.5, 0.75, 0.95]).unstack()
+
+def reference(df, sd=1, sr=5):
+    """
+        Returns a dict of metric name -> reference value for a dataframe from importdexcom()
+    """
+    g = df['Glucose'].to_numpy(dtype=float)
+    dw, up = _bounds(g, sd)
+    inside = (g <= up) & (g >= dw)
+    outside = (g >= up) | (g <= dw)
+    rl, rh = _risk(g)
+    modd_n = _modd_n(df)
+    daily_sd = _daily(df, np.nanstd)
+    daily_cv = _daily(df, lambda x: np.nanstd(x)/np.nanmean(x)*100)
+    daily_risk = _daily(df, lambda x: _risk(x)[0].max() + _risk(x)[1].max())
+    return {
+        'interdaysd': np.nanstd(g),
+        'interdaycv': np.nanstd(g)/np.nanmean(g)*100,
+        'intradaysd': _stats(daily_sd),
+        'intradaycv': _stats(daily_cv),
+        'TIR': inside.sum()*sr,
+        'TOR': outside.sum()*sr,
+        'POR': outside.sum()/len(g)*100,
+        'PIR': ((g <= up) & (g >= dw)).sum()/len(g)*100,
+        'MGE': g[outside].mean(),
+        'MGN': g[inside].mean(),
+        'MAGE': _mage(g),
+        'J_index': 0.001*(np.nanmean(g) + np.nanstd(g))**2,
+        'LBGI': rl.mean(),
+        'HBGI': rh.mean(),
+        'ADRR': daily_risk.mean(),
+        'MODD': np.nanmean(modd_n),
+        'CONGA24': np.nanstd(modd_n),
+        'GMI': 3.31 + 0.02392*np.nanmean(g),
+        'eA1c': (46.7 + np.nanmean(g))/28.7,
+        'rangemetrics': _consensus(g),
+        'agp': _agp(df),
+        'summary': (np.nanmean(g), np.nanmedian(g), np.nanmin(g), np.nanmax(g),
+                    np.nanpercentile(g, 25), np.nanpercentile(g, 75)),
+    }
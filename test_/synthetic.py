@@ -0,0 +1,65 @@
+import numpy as np
+
+"""
+    Deterministic synthetic CGM traces in Dexcom Clarity export format, for the benchmark suite.
+"""
+
+HEADER = ('Index,Timestamp (YYYY-MM-DDThh:mm:ss),Event Type,Event Subtype,Patient Info,Device Info,Source Device ID,'
+          'Glucose Value (mg/dL),Insulin Value (u),Carb Value (grams),Duration (hh:mm:ss),Glucose Rate of Change (mg/dL/min)')
+
+EVENTS = [',,FirstName,,Joe,,,,,,,',
+          ',,LastName,,Schmoe,,,,,,,',
+          ',,DateOfBirth,,1/1/1970,,,,,,,',
+          ',,Device,,,Dexcom G6 Mobile App,iPhone G6,,,,,',
+          ',,Alert,Fall,,,iPhone G6,,,,,3',
+          ',,Alert,High,,,iPhone G6,200,,,,',
+          ',,Alert,Low,,,iPhone G6,80,,,,',
+          ',,Alert,Signal Loss,,,iPhone G6,,,,0:20:00,',
+          ',,Alert,Rise,,,iPhone G6,,,,,3',
+          ',,Alert,Urgent Low,,,iPhone G6,55,,,,',
+          ',,Alert,Urgent Low Soon,,,iPhone G6,55,,,,']
+
+def synthetic_glucose(days, seed=0, sr=5):
+    """
+        Generates a deterministic glucose trace: daily rhythm, three meal responses a day and AR(1) noise
+        Args:
+            days (integer): length of the trace in days
+            seed (integer): random seed (default=0)
+            sr (integer): sampling rate in minutes (default=5)
+        Returns:
+            time (np.ndarray): datetime64[s] timestamps, with a few seconds of jitter
+            glucose (np.ndarray): integer-valued glucose between 40 and 400 mg/dL
+    """
+    rng = np.random.default_rng(seed)
+    n = days*24*60//sr
+    start = np.datetime64('2020-01-01T07:13:21', 's')
+    time = start + np.arange(n)*sr*60 + rng.integers(-2, 3, n)
+    hours = (np.arange(n)*sr/60 + 7.2) % 24
+
+    glucose = 115 + 12*np.sin(2*np.pi*(hours - 4)/24)
+    for meal in (7.5, 12.5, 19.0):
+        size = rng.normal(60, 20, days + 1).clip(0)[(np.arange(n)*sr/60 + 7.2).astype(int)//24]
+        after = (hours - meal) % 24
+        glucose += size*(after/1.0)*np.exp(1 - after/1.0)*(after < 6)
+    noise = rng.normal(0, 4, n)
+    drift = np.zeros(n)
+    for i in range(1, n):
+        drift[i] = 0.97*drift[i-1] + noise[i]
+    glucose = np.round(glucose + drift).clip(40, 400)
+    return time, glucose
+
+def write_dexcom(filename, days, seed=0):
+    """
+        Writes a synthetic trace as a Dexcom Clarity CSV export (header, 11 event rows, then EGV rows)
+    """
+    time, glucose = synthetic_glucose(days, seed)
+    stamps = np.datetime_as_string(time, unit='s')
+    with open(filename, 'w') as f:
+        f.write('\ufeff' + HEADER + '\n')
+        for i, event in enumerate(EVENTS):
+            f.write(str(i + 1) + event + '\n')
+        offset = len(EVENTS) + 1
+        f.write('\n'.join('%d,%s,EGV,,,,iPhone G6,%d,,,,' % (i + offset, t, g)
+                          for i, (t, g) in enumerate(zip(stamps, glucose))))
+        f.write('\n')
+    return filename
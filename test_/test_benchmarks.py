@@ -0,0 +1,146 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+import matplotlib.pyplot as plt
+
+import cgmquantify as cgm
+
+pytest.importorskip('pytest_benchmark')
+
+METRICS = ['interdaysd', 'interdaycv', 'intradaysd', 'intradaycv', 'TIR', 'TOR', 'POR', 'PIR', 'MGE', 'MGN',
+           'MAGE', 'J_index', 'LBGI', 'HBGI', 'ADRR', 'MODD', 'CONGA24', 'GMI', 'eA1c', 'summary']
+
+PLOTS = ['plotglucosesd', 'plotglucosebounds', 'plotglucosesmooth', 'plotagp']
+
+IMPORT_CHECK = ("import sys, cgmquantify; "
+                "print(' '.join(m for m in ('matplotlib', 'statsmodels', 'numba') if m in sys.modules))")
+
+def test_import_cold(benchmark):
+    #a fresh interpreter per round, so the package and its dependencies are imported from scratch
+    benchmark.group = 'import'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    run = lambda: subprocess.run([sys.executable, '-c', IMPORT_CHECK], env=env, capture_output=True, text=True, check=True)
+    result = benchmark.pedantic(run, rounds=5, iterations=1)
+    assert result.stdout.strip() == ''
+
+def test_importdexcom(benchmark, trace):
+    scale, path, df, expected = trace
+    benchmark.group = 'importdexcom'
+    result = benchmark(cgm.importdexcom, path)
+    assert result.equals(df)
+
+def test_importdexcom_fast(benchmark, trace):
+    scale, path, df, expected = trace
+    benchmark.group = 'importdexcom'
+    result = benchmark(cgm.importdexcom, path, fast=True)
+    np.testing.assert_array_equal(result['Time'].to_numpy(), df['Time'].to_numpy())
+    np.testing.assert_array_equal(result['Glucose'].to_numpy(dtype=float), df['Glucose'].to_numpy())
+
+@pytest.mark.parametrize('metric', METRICS)
+def test_metric(benchmark, trace, metric):
+    scale, path, df, expected = trace
+    benchmark.group = metric
+    result = benchmark(getattr(cgm, metric), df)
+    np.testing.assert_allclose(np.asarray(result, dtype=float), np.asarray(expected[metric], dtype=float))
+
+@pytest.mark.parametrize('size', [10**4, 10**5, 10**6, 10**7])
+@pytest.mark.parametrize('kernel', ['numpy', 'numba'])
+def test_riskkernel(benchmark, kernel, size):
+    #the NumPy and Numba risk kernels side by side (Numba compiled before timing); metrics.USE_NUMBA and
+    #metrics._NUMBA_MIN_SIZE are chosen from this group
+    from cgmquantify import metrics
+    benchmark.group = 'riskkernel-%d' % size
+    glucose = np.random.default_rng(0).uniform(40, 400, size)
+    if kernel == 'numba':
+        pytest.importorskip('numba')
+        func = metrics._numbakernel()
+        func(glucose[:10])
+    else:
+        func = metrics._riskkernel_numpy
+    rl, rh = benchmark.pedantic(func, (glucose,), rounds=3 if size >= 10**7 else 10)
+    if kernel == 'numba':
+        expected = metrics._riskkernel_numpy(glucose)
+        np.testing.assert_allclose(rl, expected[0], rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(rh, expected[1], rtol=1e-9, atol=1e-12)
+
+def test_compute_all(benchmark, trace):
+    scale, path, df, expected = trace
+    benchmark.group = 'compute_all'
+    result = benchmark(cgm.compute_all, df)
+    for metric in ['interdaycv', 'TIR', 'MAGE', 'LBGI', 'ADRR', 'MODD', 'GMI']:
+        np.testing.assert_allclose(result[metric], expected[metric])
+
+def test_rangemetrics(benchmark, trace):
+    scale, path, df, expected = trace
+    benchmark.group = 'rangemetrics'
+    result = benchmark(cgm.rangemetrics, df)
+    percent, gri = expected['rangemetrics']
+    np.testing.assert_allclose(result[['percent_<54', 'percent_54-69', 'percent_70-180', 'percent_181-250', 'percent_>250']], percent)
+    np.testing.assert_allclose(result['GRI'], gri)
+    daily = cgm.rangemetrics(df, by='Day')
+    np.testing.assert_allclose(daily.filter(like='time_').to_numpy().sum(), result.filter(like='time_').sum())
+
+def test_bootstrap(benchmark, trace):
+    scale, path, df, expected = trace
+    if scale == '1y':
+        pytest.skip('per-replicate metrics on a year of readings are too slow for a benchmark round')
+    from cgmquantify.bootstrap import _daysums, _drawindex, _replicate
+    benchmark.group = 'bootstrap'
+    metrics = ['MAGE', 'MODD', 'interdaycv', 'GMI', 'intradaysd', 'ADRR']
+    result = benchmark.pedantic(cgm.bootstrapsamples, (df, metrics), {'n': 200, 'seed': 0, 'processes': 1}, rounds=3)
+    #batched and per-replicate metrics give what compute_all gives on the replicates themselves
+    days = _daysums(df)
+    index = _drawindex(len(days['dates']), 200, 1, 0)[:5]
+    replicates = np.array([cgm.compute_all(_replicate(days, row), metrics).to_numpy() for row in index])
+    np.testing.assert_allclose(result.to_numpy()[:5], replicates, rtol=1e-9)
+    assert result.equals(cgm.bootstrapsamples(df, metrics, n=200, seed=0, processes=2))
+
+def test_agp(benchmark, trace):
+    scale, path, df, expected = trace
+    benchmark.group = 'agp'
+    result = benchmark(cgm.agp, df)
+    reference = expected['agp']
+    np.testing.assert_allclose(result.loc[reference.index, ['p5', 'p25', 'p50', 'p75', 'p95']], reference)
+    assert result['n'].sum() == df['Glucose'].notna().sum()
+
+@pytest.mark.parametrize('plot', PLOTS)
+def test_plot(benchmark, trace, plot):
+    scale, path, df, expected = trace
+    benchmark.group = plot
+
+    def render():
+        getattr(cgm, plot)(df)
+        figure = plt.gcf()
+        plt.close('all')
+        return figure
+
+    figure = benchmark(render)
+    assert len(figure.axes[0].lines) >= 2
+
+@pytest.mark.parametrize('plot', PLOTS)
+def test_plot_file(benchmark, trace, plot, tmp_path):
+    scale, path, df, expected = trace
+    benchmark.group = plot + '_file'
+    output = str(tmp_path / 'plot.png')
+    figures = plt.get_fignums()
+    result = benchmark(getattr(cgm, plot), df, output=output)
+    assert result == output and plt.get_fignums() == figures
+    with open(output, 'rb') as f:
+        assert f.read(8) == b'\x89PNG\r\n\x1a\n'
+
+def test_smoothglucose(benchmark, trace):
+    scale, path, df, expected = trace
+    benchmark.group = 'smoothglucose'
+    from cgmquantify.preprocess import _SMOOTH_CACHE
+    result = benchmark(lambda: (_SMOOTH_CACHE.clear(), cgm.smoothglucose(df))[1])
+    assert len(result) == len(df)
+    if scale != '1y':
+        lowess = pytest.importorskip('statsmodels.nonparametric.smoothers_lowess').lowess
+        seconds = np.asarray(df['Time'], dtype='datetime64[s]').astype(np.int64)
+        exact = lowess(df['Glucose'], seconds, is_sorted=True, frac=0.025, it=0)[:, 1]
+        np.testing.assert_allclose(cgm.smoothglucose(df, delta=0)['Glucose'], exact, rtol=1e-7)
+        np.testing.assert_allclose(result['Glucose'], exact, atol=0.05)
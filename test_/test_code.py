@@ -21,6 +21,7 @@ print('CONGA24 is: ' + str(cgm.CONGA24(data)))
 print('GMI is: ' + str(cgm.GMI(data)))
 print('eA1c is: ' + str(cgm.eA1c(data)))
 print('summary is: ' + str(cgm.summary(data)))
+print('compute_all is: \n' + str(cgm.compute_all(data)))
 
 cgm.plotglucosebounds(data)
 
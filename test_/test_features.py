@@ -0,0 +1,554 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import cgmquantify as cgm
+from synthetic import write_dexcom
+
+"""
+    Correctness checks of the modules around the metrics (batch processing, caching, importers, incremental,
+    rolling and grouped metrics, the HTTP service), on small synthetic traces. Not timed.
+"""
+
+@pytest.fixture(scope='module')
+def exports(tmp_path_factory):
+    """
+        Three short synthetic Dexcom exports: (directory, sorted paths)
+    """
+    directory = tmp_path_factory.mktemp('exports')
+    paths = [write_dexcom(str(directory / ('%s.csv' % name)), days, seed) for name, days, seed in
+             (('b', 3, 1), ('a', 2, 0), ('c', 4, 2))]
+    return directory, sorted(paths)
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_batchmetrics(exports, processes, tmp_path):
+    from cgmquantify.batch import batchmetrics
+    directory, paths = exports
+    broken = directory / 'broken.csv'
+    broken.write_text('not,a,dexcom,export\n1,2,3,4\n')
+    try:
+        table = batchmetrics([str(directory)], ['GMI', 'TIR'], processes=processes, progress=False)
+    finally:
+        broken.unlink()
+    #rows in sorted file order whatever the scheduling; the bad file gets an error and NaN metrics
+    assert list(table['file']) == sorted(paths + [str(broken)])
+    failed = table['file'] == str(broken)
+    assert table.loc[failed, 'error'].iloc[0] != '' and table.loc[failed, ['GMI', 'TIR']].isna().all(axis=None)
+    for path in paths:
+        row = table[table['file'] == path].iloc[0]
+        assert row['error'] == ''
+        expected = cgm.compute_all(cgm.importdexcom(path), ['GMI', 'TIR'])
+        np.testing.assert_allclose(row[['GMI', 'TIR']].to_numpy(dtype=float), expected.to_numpy())
+
+def _withgaps(path):
+    #an imported export with a few missing readings (NaN glucose), as Dexcom writes High/Low or dropouts
+    df = cgm.importdexcom(path)
+    df.loc[[5, 6, 7, 300, 301, len(df) - 2], 'Glucose'] = np.nan
+    return df
+
+def test_incremental(exports):
+    directory, paths = exports
+    df = _withgaps(paths[2])
+    metrics = cgm.IncrementalCGM.METRICS
+    expected = cgm.compute_all(df, metrics)
+    time, glucose = df['Time'].to_numpy(), df['Glucose'].to_numpy()
+
+    single = cgm.IncrementalCGM()
+    for t, g in zip(time, glucose):
+        single.update(t, g)
+    batched = cgm.IncrementalCGM()
+    for chunk in np.array_split(np.arange(len(df)), 7):
+        batched.update(time[chunk], glucose[chunk])
+
+    for live in (single, batched):
+        result = live.metrics(metrics)
+        assert list(result.index) == list(expected.index)
+        np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-9)
+    with pytest.raises(ValueError):
+        single.metrics(['MAGE'])
+
+def test_rollingmetrics(exports):
+    directory, paths = exports
+    df = _withgaps(paths[2])
+    metrics = cgm.rolling.ROLLING_METRICS
+    table = cgm.rollingmetrics(df, window='2D', metrics=metrics)
+    days = df['Time'].dt.normalize()
+    assert len(table) == days.nunique() and list(table.columns) == metrics + ['n']
+    #the first day has no whole 2-day window behind it
+    assert table.iloc[0][metrics].isna().all() and table['n'].iloc[0] == df['Glucose'][days == days.iloc[0]].count()
+    for day in table.index[1:]:
+        window = df[(days > day - pd.Timedelta('2D')) & (days <= day)].reset_index(drop=True)
+        np.testing.assert_allclose(table.loc[day, metrics].to_numpy(dtype=float),
+                                   cgm.compute_all(window, metrics).to_numpy(), rtol=1e-9)
+        assert table.loc[day, 'n'] == window['Glucose'].count()
+
+    short = cgm.rollingmetrics(df, window='2D', metrics=['GMI'], min_periods=1)
+    first = df[days == days.iloc[0]]
+    np.testing.assert_allclose(short['GMI'].iloc[0], cgm.GMI(first))
+    assert cgm.rollingmetrics(df, window='2D', metrics=['GMI'], min_periods=10**6)['GMI'].isna().all()
+    empty = cgm.rollingmetrics(df.iloc[:0], window='2D', metrics=['GMI'])
+    assert len(empty) == 0 and list(empty.columns) == ['GMI', 'n']
+
+def test_cgmseries(exports):
+    directory, paths = exports
+    df = _withgaps(paths[1])
+    series = cgm.CGMSeries.from_dataframe(df)
+    assert series['Glucose'].dtype == np.float64
+    for name in ['interdaycv', 'interdaysd', 'GMI', 'eA1c', 'MGE', 'MGN', 'J_index', 'summary', 'TIR', 'LBGI',
+                 'ADRR', 'MODD', 'MAGE', 'intradaysd']:
+        np.testing.assert_allclose(getattr(cgm, name)(series), getattr(cgm, name)(df), rtol=1e-12, err_msg=name)
+    np.testing.assert_allclose(cgm.compute_all(series).to_numpy(), cgm.compute_all(df).to_numpy(), rtol=1e-12)
+
+def test_cache(exports, tmp_path, monkeypatch):
+    from cgmquantify import cache as cachemodule
+    directory, paths = exports
+    calls = {'importdexcom': 0, 'compute_all': 0}
+    for name in calls:
+        def counted(*args, _name=name, _func=getattr(cachemodule, name), **kwargs):
+            calls[_name] += 1
+            return _func(*args, **kwargs)
+        monkeypatch.setattr(cachemodule, name, counted)
+    cache = cachemodule.CGMCache(tmp_path / 'cache')
+
+    expected = cgm.compute_all(cgm.importdexcom(paths[0]), ['GMI', 'TIR'])
+    first = cache.compute_all(paths[0], ['GMI', 'TIR'])
+    second = cache.compute_all(paths[0], ['GMI', 'TIR'])
+    assert calls == {'importdexcom': 1, 'compute_all': 1}
+    np.testing.assert_allclose(first.to_numpy(), expected.to_numpy())
+    np.testing.assert_allclose(second.to_numpy(), expected.to_numpy())
+    pd.testing.assert_frame_equal(cache.importdexcom(paths[0]), cgm.importdexcom(paths[0]))
+    assert calls['importdexcom'] == 1
+
+    #new parameters or a new metrics version miss the metric entry but reuse the parsed file
+    cache.compute_all(paths[0], ['GMI', 'TIR'], sd=2)
+    assert calls == {'importdexcom': 1, 'compute_all': 2}
+    monkeypatch.setattr(cachemodule, 'METRICS_VERSION', cachemodule.METRICS_VERSION + 1)
+    cache.compute_all(paths[0], ['GMI', 'TIR'])
+    assert calls == {'importdexcom': 1, 'compute_all': 3}
+    monkeypatch.setattr(cachemodule, 'IMPORTER_VERSION', cachemodule.IMPORTER_VERSION + 1)
+    cache.compute_all(paths[0], ['GMI', 'TIR'])
+    assert calls == {'importdexcom': 2, 'compute_all': 4}
+
+def test_cache_eviction(exports, tmp_path):
+    import os
+    from cgmquantify.cache import CGMCache
+    directory, paths = exports
+    cache = CGMCache(tmp_path / 'cache')
+    for path in paths:
+        cache.importdexcom(path)
+    entries = sorted(os.scandir(tmp_path / 'cache' / 'parsed'), key=lambda e: e.name)
+    #age the entries, then use the oldest one again: it becomes the most recently used
+    for age, entry in enumerate(entries):
+        os.utime(entry.path, (1000 + age, 1000 + age))
+    cache.importdexcom(paths[0])
+    used = [e for e in entries if os.path.getmtime(e.path) > 10**6]
+    assert len(used) == 1
+    sizes = {e.path: os.path.getsize(e.path) for e in entries}
+
+    cache.max_bytes = sizes[used[0].path] + 1
+    cache.evict()
+    assert [e.name for e in os.scandir(tmp_path / 'cache' / 'parsed')] == [used[0].name]
+    assert cache.size() <= cache.max_bytes
+    #writes past max_bytes evict the least recently used entries
+    cache.compute_all(paths[1], ['GMI'])
+    assert cache.size() <= cache.max_bytes
+    cache.clear()
+    assert cache.size() == 0
+
+def _gappytrace():
+    #5-minute readings with an 8-minute stretch, a missing reading, a 21-minute gap (shorter than resample's
+    #max_gap) and a 60-minute gap (longer); glucose rises linearly, so interpolated values are known exactly
+    minutes = np.concatenate([np.arange(0, 61, 5), [68, 76, 84], np.arange(89, 120, 5), np.arange(140, 201, 5),
+                              np.arange(260, 301, 5)])
+    time = np.datetime64('2021-01-01T00:00:00') + minutes*np.timedelta64(60, 's')
+    glucose = 100 + 0.5*minutes
+    glucose[minutes == 170] = np.nan
+    df = pd.DataFrame({'Time': pd.to_datetime(time), 'Glucose': glucose})
+    df['Day'] = df['Time'].dt.date
+    return df, minutes
+
+def test_findgaps_resample():
+    df, minutes = _gappytrace()
+    gaps = cgm.findgaps(df, max_gap=15)
+    start = pd.Timestamp('2021-01-01')
+    assert list(gaps['Start']) == [start + pd.Timedelta(minutes=119), start + pd.Timedelta(minutes=200)]
+    assert list(gaps['End']) == [start + pd.Timedelta(minutes=140), start + pd.Timedelta(minutes=260)]
+    assert list(gaps['Minutes']) == [21, 60]
+
+    resampled = cgm.resample(df, sr=5, max_gap=30)
+    grid = ((resampled['Time'] - start).dt.total_seconds()//60).to_numpy()
+    np.testing.assert_array_equal(grid, np.arange(0, 301, 5))
+    inside_long_gap = (grid > 200) & (grid < 260)
+    assert resampled['Glucose'][inside_long_gap].isna().all()
+    assert not resampled['Interpolated'][inside_long_gap].any()
+    np.testing.assert_allclose(resampled['Glucose'][~inside_long_gap], 100 + 0.5*grid[~inside_long_gap])
+    assert list(grid[resampled['Interpolated']]) == [65, 70, 75, 80, 120, 125, 130, 135, 170]
+
+    #no readings with glucose: no gaps and an empty grid
+    missing = df.assign(Glucose=np.nan)
+    assert len(cgm.findgaps(missing)) == 0
+    empty = cgm.resample(missing)
+    assert len(empty) == 0 and list(empty.columns) == ['Time', 'Glucose', 'Day', 'Interpolated']
+
+def test_elapsed_time_ranges(monkeypatch):
+    df, minutes = _gappytrace()
+    glucose = df['Glucose'].to_numpy()
+    #minutes each reading stands for: the time to the next reading, 5 (the typical interval) across gaps longer
+    #than 10 minutes and for the last reading, 0 for the missing reading
+    durations = np.append(np.diff(minutes), 5).astype(float)
+    durations[durations > 10] = 5
+    durations[np.isnan(glucose)] = 0
+    assert list(durations[12:17]) == [8, 8, 8, 5, 5]
+    up = np.nanmean(glucose) + np.nanstd(glucose)
+    dw = np.nanmean(glucose) - np.nanstd(glucose)
+    inside = (glucose >= dw) & (glucose <= up)
+    outside = (glucose >= up) | (glucose <= dw)
+    np.testing.assert_allclose(cgm.TIR(df, sr=None), durations[inside].sum())
+    np.testing.assert_allclose(cgm.TOR(df, sr=None), durations[outside].sum())
+    np.testing.assert_allclose(cgm.PIR(df, sr=None), durations[inside].sum()/durations.sum()*100)
+    np.testing.assert_allclose(cgm.compute_all(df, ['TIR', 'POR'], sr=None).to_numpy(),
+                               [durations[inside].sum(), durations[outside].sum()/durations.sum()*100])
+    #durations are only computed when sr is None
+    from cgmquantify import metrics
+    calls = []
+    func, deps = metrics._INTERMEDIATES['durations']
+    monkeypatch.setitem(metrics._INTERMEDIATES, 'durations', (lambda *args: calls.append(1) or func(*args), deps))
+    cgm.compute_all(df, ['TIR', 'TOR', 'POR', 'PIR'])
+    assert calls == []
+    cgm.compute_all(df, ['TIR', 'TOR', 'POR', 'PIR'], sr=None)
+    assert calls == [1]
+    #on the resampled grid every reading stands for 5 minutes and the long gap for none
+    resampled = cgm.resample(df, sr=5, max_gap=30)
+    np.testing.assert_allclose(cgm.TIR(resampled, sr=None), cgm.TIR(resampled, sr=5))
+
+#small vendor exports: a header (with the preamble lines each vendor writes) and a few rows, including the
+#Low/High sentinels and rows without a reading
+VENDOR_EXPORTS = {
+    'dexcom': ('Index,Timestamp (YYYY-MM-DDThh:mm:ss),Event Type,Event Subtype,Glucose Value (mmol/L)\n'
+               '1,,FirstName,,\n'
+               '2,2021-01-13T13:05:00,EGV,,5.5\n'
+               '3,2021-01-13T13:10:00,EGV,,Low\n'
+               '4,2021-01-13T13:15:00,Calibration,,\n'
+               '5,2021-01-14T00:05:00,EGV,,High\n',
+               'mmol/L', 400),
+    'libre': ('Glucose Data,Generated on,01-20-2021 09:00 AM,Generated by,Someone\n'
+              'Device,Serial Number,Device Timestamp,Record Type,Historic Glucose mmol/L,Scan Glucose mmol/L\n'
+              'FreeStyle LibreLink,ABC,01-13-2021 13:05,0,5.5,\n'
+              'FreeStyle LibreLink,ABC,01-13-2021 13:10,0,LO,\n'
+              'FreeStyle LibreLink,ABC,01-13-2021 13:12,1,,6.0\n'
+              'FreeStyle LibreLink,ABC,01-14-2021 00:05,0,HI,\n',
+              'mmol/L', 500),
+    'medtronic': ('Last Name,First Name,Patient ID\n'
+                  'Doe,Jane,\n'
+                  'Index,Date,Time,BG Reading (mmol/L),Sensor Glucose (mmol/L),ISIG Value\n'
+                  '1,2021/01/13,13:05:00,,5.5,20.1\n'
+                  '2,2021/01/13,13:10:00,,Low,20.1\n'
+                  '3,2021/01/13,13:12:00,6.0,,\n'
+                  'Index,Date,Time,BG Reading (mmol/L),Sensor Glucose (mmol/L),ISIG Value\n'
+                  '4,2021/01/14,00:05:00,,High,20.1\n',
+                  'mmol/L', 400),
+    'eversense': ('Date,Time,Glucose (mg/dL)\n'
+                  '01/13/2021,13:05:00,99\n'
+                  '01/13/2021,13:10:00,Low\n'
+                  '01/13/2021,13:12:00,\n'
+                  '01/14/2021,00:05:00,High\n',
+                  'mg/dL', 400),
+}
+
+@pytest.mark.parametrize('vendor', sorted(VENDOR_EXPORTS))
+def test_importcgm(vendor, tmp_path):
+    text, unit, high = VENDOR_EXPORTS[vendor]
+    path = tmp_path / ('%s.csv' % vendor)
+    path.write_text(text)
+    assert cgm.importers.detectvendor(str(path)) == vendor
+    df = cgm.importcgm(str(path))
+    start = pd.Timestamp('2021-01-13 13:05')
+    assert list(df['Time']) == [start, start + pd.Timedelta(minutes=5), pd.Timestamp('2021-01-14 00:05')]
+    #5.5 mmol/L is 99 mg/dL
+    np.testing.assert_allclose(df['Glucose'], [99, 40, high])
+    assert list(df['Day']) == [start.date(), start.date(), pd.Timestamp('2021-01-14').date()]
+
+@pytest.mark.parametrize('timestamp', ['01-13-2021 01:05 PM', '01-13-2021 13:05', '13-01-2021 13:05',
+                                       '2021-01-13 13:05'])
+def test_importcgm_libre_timestamps(timestamp, tmp_path):
+    header, row = VENDOR_EXPORTS['libre'][0].splitlines()[1:3]
+    path = tmp_path / 'libre.csv'
+    path.write_text('%s\n%s\n' % (header, row.replace('01-13-2021 13:05', timestamp)))
+    assert list(cgm.importcgm(str(path))['Time']) == [pd.Timestamp('2021-01-13 13:05')]
+    #a file whose timestamps match no known format has no readings
+    path.write_text('%s\n%s\n' % (header, row.replace('01-13-2021 13:05', '13 Jan 2021 13:05')))
+    with pytest.raises(ValueError):
+        cgm.importcgm(str(path))
+
+def _cohort(paths):
+    #the exports of several patients in one long dataframe, plus readings without a patient id
+    frames = [_withgaps(path).assign(patient_id=name) for name, path in zip('bac', paths)]
+    orphans = frames[0].iloc[:20].assign(patient_id=None, Glucose=400.0)
+    return pd.concat(frames + [orphans], ignore_index=True)
+
+@pytest.mark.parametrize('sr', [5, None])
+def test_groupmetrics(exports, sr):
+    directory, paths = exports
+    cohort = _cohort(paths)
+    table = cgm.groupmetrics(cohort, sr=sr, processes=1)
+    assert list(table.index) == ['a', 'b', 'c']
+    for patient, df in cohort.groupby('patient_id'):
+        expected = cgm.compute_all(df.reset_index(drop=True), sr=sr)
+        np.testing.assert_allclose(table.loc[patient].to_numpy(dtype=float), expected.to_numpy(), rtol=1e-9,
+                                   err_msg=patient)
+    with pytest.raises(ValueError):
+        cgm.groupmetrics(cohort.assign(patient_id=None))
+
+def test_dataset(exports, tmp_path):
+    pytest.importorskip('pyarrow')
+    from cgmquantify.dataset import writedataset, readdataset
+    directory, paths = exports
+    root = str(tmp_path / 'dataset')
+    #ids that look like numbers stay strings; small row groups so the time filter has groups to skip
+    writedataset(paths[:2], root, patient_ids=['007', 'b'], row_group_size=100)
+    writedataset(paths[2], root, patient_ids=['c'], row_group_size=100)
+    frames = {patient: cgm.importdexcom(path).sort_values('Time', kind='stable').reset_index(drop=True)
+              for patient, path in zip(['007', 'b', 'c'], paths)}
+
+    def check(df, patient, expected):
+        part = df[df['patient_id'] == patient]
+        np.testing.assert_array_equal(part['Time'].to_numpy(dtype='datetime64[ns]'),
+                                      expected['Time'].to_numpy(dtype='datetime64[ns]'))
+        np.testing.assert_array_equal(part['Glucose'].to_numpy(dtype=float), expected['Glucose'].to_numpy())
+        assert list(part['Day']) == list(expected['Day'])
+
+    df = readdataset(root)
+    assert list(df.columns) == ['Time', 'Glucose', 'Day', 'patient_id']
+    assert list(df['patient_id'].unique()) == ['007', 'b', 'c']
+    for patient, expected in frames.items():
+        check(df, patient, expected)
+
+    expected = frames['c']
+    start, end = expected['Time'].iloc[250], expected['Time'].iloc[700]
+    df = readdataset(root, patients=['c', '007'], start=start, end=end)
+    assert set(df['patient_id']) <= {'c', '007'}
+    check(df, 'c', expected[(expected['Time'] >= start) & (expected['Time'] < end)])
+    first = frames['007']['Time']
+    check(df, '007', frames['007'][(first >= start) & (first < end)])
+    assert len(readdataset(root, patients='b', end=frames['b']['Time'].iloc[0])) == 0
+
+@pytest.mark.parametrize('chunksize', [100, 700, 10**6])
+def test_chunkedmetrics(exports, chunksize):
+    directory, paths = exports
+    #100 rows is a third of a day, so days are carried across several chunks; 700 cuts mid-day
+    result = cgm.chunkedmetrics(paths[2], chunksize=chunksize)
+    expected = cgm.compute_all(cgm.importdexcom(paths[2]))
+    assert list(result.index) == list(expected.index)
+    np.testing.assert_allclose(result.to_numpy(dtype=float), expected.to_numpy(dtype=float), rtol=1e-9)
+
+def _namespaces():
+    #every function binding in the package and submodule namespaces, and the compute_all tables
+    import sys
+    from cgmquantify import metrics
+    modules = [m for n, m in sorted(sys.modules.items()) if m is not None and n.split('.')[0] == 'cgmquantify']
+    bindings = {(m.__name__, name): obj for m in modules for name, obj in vars(m).items() if callable(obj)}
+    return bindings, dict(metrics._METRICS), dict(metrics._INTERMEDIATES)
+
+def test_profiler(exports):
+    directory, paths = exports
+    before = _namespaces()
+    outer, inner = cgm.Profiler(), cgm.Profiler(memory=True)
+    outer.start()
+    assert cgm.GMI is not before[0][('cgmquantify', 'GMI')]
+    with inner:
+        cgm.compute_all(cgm.importdexcom(paths[0]), ['GMI', 'MAGE'])
+    #the package stays instrumented until the last profiler stops
+    assert cgm.GMI is not before[0][('cgmquantify', 'GMI')]
+    cgm.GMI(cgm.importdexcom(paths[0]))
+    outer.stop()
+    bindings, metrictable, intermediates = _namespaces()
+    assert bindings == before[0] and metrictable == before[1] and intermediates == before[2]
+
+    functions = [record['function'] for record in inner.records]
+    assert {'importdexcom', 'compute_all', 'compute_all.GMI', 'compute_all.MAGE'} <= set(functions)
+    assert all(record['peak_bytes'] is not None for record in inner.records)
+    assert [record['function'] for record in outer.records].count('GMI') == 1
+    assert outer.summary().loc['compute_all', 'calls'] == 1
+
+    #an exception inside the block restores the originals too
+    with pytest.raises(ZeroDivisionError):
+        with cgm.Profiler():
+            1/0
+    assert _namespaces()[0] == before[0]
+
+def test_service(exports, monkeypatch):
+    import asyncio
+    import json
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from cgmquantify import service as servicemodule
+    directory, paths = exports
+    with open(paths[0], 'rb') as f:
+        upload = f.read()
+    expected = cgm.compute_all(cgm.importdexcom(paths[0]), ['GMI', 'TIR'])
+    running, finish = threading.Event(), threading.Event()
+
+    def blocked(*args, _compute=servicemodule._compute):
+        running.set()
+        finish.wait(10)
+        return _compute(*args)
+
+    async def scenario():
+        service = servicemodule.MetricsService(executor=ThreadPoolExecutor(1), max_pending=1, timeout=5)
+        try:
+            monkeypatch.setattr(servicemodule, '_compute', blocked)
+            with pytest.raises(TimeoutError, match='within'):
+                await service.compute(upload, ['GMI', 'TIR'], timeout=0.2)
+            assert running.is_set()
+            #the abandoned request still holds the only slot until its work ends
+            with pytest.raises(TimeoutError, match='busy'):
+                await service.compute(upload, ['GMI', 'TIR'], timeout=0.2)
+            finish.set()
+            result = await service.compute(upload, ['GMI', 'TIR'], timeout=5)
+            np.testing.assert_allclose(result.to_numpy(), expected.to_numpy())
+
+            #over HTTP: a malformed Content-Length is a client error
+            server = await asyncio.start_server(lambda r, w: servicemodule._handle(service, len(upload), r, w),
+                                                '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+
+            async def post(query, length, body=b''):
+                #status and JSON body of one request
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(b'POST /metrics%s HTTP/1.1\r\nContent-Length: %s\r\n\r\n' % (query, length) + body)
+                await writer.drain()
+                head, response = (await reader.read()).split(b'\r\n\r\n', 1)
+                writer.close()
+                return int(head.split(b' ', 2)[1]), json.loads(response)
+
+            for length, status in ((b'abc', 400), (b'-5', 400), (b'%d' % (len(upload) + 1), 413)):
+                assert (await post(b'', length))[0] == status
+            #std is a whole number of readings; MAGE is in the default metrics
+            status, response = await post(b'?metrics=MAGE,GMI&std=1', b'%d' % len(upload), upload)
+            assert status == 200
+            mage = cgm.compute_all(cgm.importdexcom(paths[0]), ['MAGE', 'GMI'], std=1)
+            np.testing.assert_allclose([response['metrics']['MAGE'], response['metrics']['GMI']], mage.to_numpy())
+
+            #a stalled header or upload is answered with 408 once the service timeout passes
+            service.timeout = 0.3
+            for request in (b'POST /metrics HTTP/1.1\r\nContent-',
+                            b'POST /metrics HTTP/1.1\r\nContent-Length: 10\r\n\r\nabc'):
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(request)
+                await writer.drain()
+                response = await asyncio.wait_for(reader.read(), 5)
+                writer.close()
+                assert response.split(b' ', 2)[1] == b'408'
+            server.close()
+            await server.wait_closed()
+        finally:
+            finish.set()
+            service.close()
+
+    asyncio.run(scenario())
+
+@pytest.mark.parametrize('sr', [5, None])
+def test_rangemetrics_by_patient(exports, sr):
+    directory, paths = exports
+    cohort = _cohort(paths)
+    table = cgm.rangemetrics(cohort, sr=sr, by='patient_id')
+    assert list(table.index) == ['a', 'b', 'c']
+    for patient, df in cohort.groupby('patient_id'):
+        expected = cgm.rangemetrics(df.reset_index(drop=True), sr=sr)
+        np.testing.assert_allclose(table.loc[patient].to_numpy(dtype=float), expected.to_numpy(dtype=float),
+                                   rtol=1e-9, err_msg=patient)
+
+def test_agp(exports):
+    directory, paths = exports
+    cohort = _cohort(paths)
+    table = cgm.agp(cohort, binsize=15, by='patient_id')
+    assert list(table.index.levels[0]) == ['a', 'b', 'c']
+    for patient, df in cohort.groupby('patient_id'):
+        pd.testing.assert_frame_equal(table.loc[patient], cgm.agp(df, binsize=15))
+
+    #a centred average over 3 bins, wrapping around midnight; an even width averages the next odd number of bins
+    df = _withgaps(paths[2])
+    profile = cgm.agp(df, binsize=60)['p50'].to_numpy()
+    smoothed = cgm.agp(df, binsize=60, smooth=3)['p50'].to_numpy()
+    np.testing.assert_allclose(smoothed, (np.roll(profile, 1) + profile + np.roll(profile, -1))/3)
+    pd.testing.assert_frame_equal(cgm.agp(df, binsize=60, smooth=4), cgm.agp(df, binsize=60, smooth=5))
+    #the widest window of 24 hourly bins averages every bin but the one 12 hours away
+    widest = cgm.agp(df, binsize=60, smooth=23)['p50'].to_numpy()
+    np.testing.assert_allclose(widest, (profile.sum() - np.roll(profile, 12))/23)
+    for smooth in (24, 60):
+        with pytest.raises(ValueError):
+            cgm.agp(df, binsize=60, smooth=smooth)
+
+def test_plot_decimation(tmp_path):
+    import io
+    from cgmquantify import plotting
+    #a month of readings is more points than the report axes have pixels at 100 dpi
+    df = cgm.importdexcom(write_dexcom(str(tmp_path / 'month.csv'), 30, 3))
+    points = {}
+    for dpi in (100, 300):
+        output = io.BytesIO()
+        cgm.plotglucosebounds(df, output=output, dpi=dpi)
+        ax = plotting._REPORT_AXES
+        points[dpi] = len(ax.lines[0].get_xdata())
+        #the points are decimated at the resolution the image is saved at
+        assert points[dpi] <= len(df) and ax.figure.dpi == dpi
+    assert points[100] < points[300]
+
+def test_star_import():
+    import types
+    namespace = {}
+    exec('from cgmquantify import *', namespace)
+    for name in ['plotglucosesd', 'plotglucosebounds', 'plotglucosesmooth', 'plotagp', 'importdexcom', 'MAGE',
+                 'compute_all', 'agp', 'Profiler']:
+        assert callable(namespace[name]), name
+    #every public function, class and constant of the package is exported
+    public = {name for name, value in vars(cgm).items()
+              if not name.startswith('_') and not isinstance(value, types.ModuleType)}
+    assert public <= set(cgm.__all__)
+
+def test_rangemetrics_fractional():
+    from reference import _consensus
+    #fractional mg/dL, as converted from mmol/L (10.04 mmol/L is 180.72 mg/dL): <54 and <70 are lower edges,
+    #<=180 and <=250 upper ones
+    glucose = np.array([53.9, 54, 69.9, 70, 180, 180.5, 10.04*18, 250, 250.5, 251])
+    df = pd.DataFrame({'Time': pd.date_range('2021-01-01', periods=len(glucose), freq='5min'), 'Glucose': glucose})
+    result = cgm.rangemetrics(df)
+    np.testing.assert_allclose(result[['time_<54', 'time_54-69', 'time_70-180', 'time_181-250', 'time_>250']],
+                               np.array([1, 2, 2, 3, 2])*5)
+    percent, gri = _consensus(glucose)
+    np.testing.assert_allclose(result.filter(like='percent_'), percent)
+    np.testing.assert_allclose([result['GRI'], cgm.GRI(df)], [gri, gri])
+    #other thresholds: a reading equal to an edge belongs to the band above it unless listed in upper_edges
+    np.testing.assert_allclose(cgm.rangemetrics(df, thresholds=(70, 180))[['time_<70', 'time_70-179', 'time_>179']],
+                               np.array([3, 1, 6])*5)
+    custom = cgm.rangemetrics(df, thresholds=(70, 180), upper_edges=[180])
+    assert list(custom.filter(like='time_').index) == ['time_<70', 'time_70-180', 'time_>180']
+    np.testing.assert_allclose(custom.filter(like='time_'), np.array([3, 2, 5])*5)
+
+@pytest.mark.parametrize('block', [1, 2])
+def test_bootstrap(exports, block):
+    from cgmquantify.bootstrap import _daysums, _drawindex, _replicate
+    directory, paths = exports
+    df = _withgaps(paths[2])
+    metrics = ['GMI', 'interdaycv', 'TIR', 'MAGE', 'MODD', 'intradaysd', 'ADRR']
+    samples = cgm.bootstrapsamples(df, metrics, n=60, seed=0, block=block, processes=1)
+    #batched and per-replicate metrics give what compute_all gives on the replicates themselves
+    days = _daysums(df)
+    index = _drawindex(len(days['dates']), 60, block, 0)
+    if block == 2:
+        #days are drawn in runs of two consecutive days
+        assert (index[:, 1::2] == index[:, 0:-1:2] + 1).all()
+    replicates = np.array([cgm.compute_all(_replicate(days, row), metrics).to_numpy() for row in index])
+    np.testing.assert_allclose(samples.to_numpy(), replicates, rtol=1e-9)
+
+    table = cgm.bootstrapmetrics(df, metrics, n=60, ci=90, seed=0, block=block, processes=1)
+    assert list(table.columns) == ['estimate', 'mean', 'se', 'lower', 'upper']
+    assert list(table.index) == list(samples.columns)
+    np.testing.assert_allclose(table['estimate'], cgm.compute_all(df, metrics))
+    np.testing.assert_allclose(table['lower'], np.nanpercentile(samples, 5, axis=0))
+    np.testing.assert_allclose(table['upper'], np.nanpercentile(samples, 95, axis=0))
+    assert (table['lower'] <= table['upper']).all() and (table['se'] >= 0).all()
+    #a fixed seed reproduces the intervals, whatever the number of processes
+    pd.testing.assert_frame_equal(table, cgm.bootstrapmetrics(df, metrics, n=60, ci=90, seed=0, block=block,
+                                                              processes=2))
+    assert not table.equals(cgm.bootstrapmetrics(df, metrics, n=60, ci=90, seed=1, block=block, processes=1))